@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SightingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sightings'
+
+    def ready(self):
+        from sightings import signals  # noqa: F401
@@ -17,3 +17,17 @@ class DatetimeInputValidationException(Exception):
     Raise when validating a datetime input object
     """
     pass
+
+
+class SortInputValidationException(Exception):
+    """
+    Raise when validating a sort input object
+    """
+    pass
+
+
+class QueryBudgetExceededException(Exception):
+    """
+    Raise when a request runs more database queries than its budget, or repeats a query shape (N+1)
+    """
+    pass
@@ -1,3 +1,4 @@
+import math
 from typing import Iterable
 from django.db import models
 from django.db.models import Q
@@ -17,6 +18,12 @@ class BaseFilter:
     def get_query(self, **kwargs) -> models.Q:
         return Q()
 
+    def bounded_area(self) -> float:
+        """
+        Area, in square meters, of a region containing every location matched by the filter, inf if unbounded
+        """
+        return math.inf
+
 
 class BaseFilterResolver:
     """
@@ -0,0 +1,72 @@
+import math
+from typing import Iterable
+from django.db.models import QuerySet
+from django.db.models.query import Q
+from sightings.filters.base import BaseFilter
+
+
+# matches no rows; Django short-circuits it without querying the database
+MATCH_NONE = Q(pk__in=[])
+
+
+class BooleanFilter(BaseFilter):
+    """
+    Base of the filters combining child filters into a single query
+    """
+    def __init__(self, filters: Iterable[BaseFilter]):
+        self.filters = list(filters)
+
+    def validate(self) -> bool:
+        return all(f.validate() for f in self.filters)
+
+    def filter_qs(self, query_set: QuerySet) -> QuerySet:
+        return query_set.filter(self.get_query())
+
+
+class AndFilter(BooleanFilter):
+    """
+    Filter matching rows matched by every one of its child filters
+    """
+    def get_query(self, **kwargs) -> Q:
+        query = Q()
+        for f in self.filters:
+            query &= f.get_query()
+
+        return query
+
+    def bounded_area(self) -> float:
+        return min((f.bounded_area() for f in self.filters), default=math.inf)
+
+
+class OrFilter(BooleanFilter):
+    """
+    Filter matching rows matched by at least one of its child filters
+    """
+    def get_query(self, **kwargs) -> Q:
+        if not self.filters:
+            return MATCH_NONE
+
+        query = Q()
+        for f in self.filters:
+            child = f.get_query()
+            if not child:
+                # an empty Q object matches every row, and so does the whole disjunction
+                return Q()
+            query |= child
+
+        return query
+
+    def bounded_area(self) -> float:
+        return sum(f.bounded_area() for f in self.filters)
+
+
+class NotFilter(BooleanFilter):
+    """
+    Filter matching rows not matched by its child filter
+    """
+    def __init__(self, f: BaseFilter):
+        super().__init__([f])
+
+    def get_query(self, **kwargs) -> Q:
+        query = self.filters[0].get_query()
+        return ~query if query else MATCH_NONE
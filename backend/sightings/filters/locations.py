@@ -1,3 +1,4 @@
+import math
 from typing import Optional
 from django.db.models import QuerySet
 from django.db.models.query import Q
@@ -6,9 +7,12 @@ from sightings.exceptions import LocationInputValidationException
 from sightings.models import Location
 from sightings.helpers.geocoding import (
     validate_longitude_latitude,
+    validate_bounds,
+    generate_lat_lon_bounds_query,
     locations_distance_within_q,
     locations_distance_outside_q,
 )
+from sightings.helpers.distance import bounds_area, circle_area
 from sightings.helpers.locations import (
     locations_q_by_search_query,
     locations_q_by_state_name_exact,
@@ -51,28 +55,53 @@ class DistanceFromFilter(BaseFilter):
 
         return True
 
-    def get_query(
-        self, locations: QuerySet[Location], latitude: float, longitude: float, arc_length: float
-    ) -> Q:
+    def get_query(self, **kwargs) -> Q:
         if self.inside_circle:
-            return locations_distance_within_q(
-                locations, self.latitude, self.longitude, self.arc_length
-            )
+            return locations_distance_within_q(self.latitude, self.longitude, self.arc_length)
         else:
-            return locations_distance_outside_q(
-                locations, self.latitude, self.longitude, self.arc_length
+            return locations_distance_outside_q(self.latitude, self.longitude, self.arc_length)
+
+    def filter_qs(self, query_set: QuerySet[Location]) -> QuerySet[Location]:
+        return query_set.filter(self.get_query())
+
+    def bounded_area(self) -> float:
+        return circle_area(self.arc_length) if self.inside_circle else math.inf
+
+
+class WithinBoundsFilter(BaseFilter):
+    """
+    Filter a list of locations to those inside a latitude/longitude rectangle.
+    west, east - bounding longitudes. If west is greater than east, the rectangle crosses the antimeridian.
+    south, north - bounding latitudes
+    """
+    def __init__(
+        self,
+        west: float,
+        south: float,
+        east: float,
+        north: float
+    ):
+        self.west = west
+        self.south = south
+        self.east = east
+        self.north = north
+
+    def validate(self) -> bool:
+        if not validate_bounds(self.west, self.south, self.east, self.north):
+            raise LocationInputValidationException(
+                f'Invalid bounds: ({self.west}, {self.south}, {self.east}, {self.north})'
             )
 
+        return True
+
+    def get_query(self, **kwargs) -> Q:
+        return generate_lat_lon_bounds_query(self.west, self.south, self.east, self.north)
+
     def filter_qs(self, query_set: QuerySet[Location]) -> QuerySet[Location]:
-        if not query_set.exists():
-            return query_set
+        return query_set.filter(self.get_query())
 
-        return query_set.filter(self.get_query(
-            locations=query_set,
-            latitude=self.latitude,
-            longitude=self.longitude,
-            arc_length=self.arc_length,
-        ))
+    def bounded_area(self) -> float:
+        return bounds_area(self.west, self.south, self.east, self.north)
 
 
 class LocationQueryStringFilter(BaseFilter):
@@ -88,16 +117,13 @@ class LocationQueryStringFilter(BaseFilter):
         """
         return True
 
-    def get_query(self) -> Q:
+    def get_query(self, **kwargs) -> Q:
         if self.q is None or self.q.strip() == "":
             return Q()
 
         return locations_q_by_search_query(self.q)
 
     def filter_qs(self, query_set: QuerySet[Location]) -> QuerySet[Location]:
-        if not query_set.exists():
-            return query_set
-
         return query_set.filter(self.get_query())
 
 
@@ -126,7 +152,7 @@ class LocationExactFilter(BaseFilter):
 
         return True
 
-    def get_query(self) -> Q:
+    def get_query(self, **kwargs) -> Q:
         query = Q()
 
         if all(i is None or i.strip() == "" for i in
@@ -146,7 +172,4 @@ class LocationExactFilter(BaseFilter):
         return query
 
     def filter_qs(self, query_set: QuerySet[Location]) -> QuerySet[Location]:
-        if not query_set.exists():
-            return query_set
-
         return query_set.filter(self.get_query())
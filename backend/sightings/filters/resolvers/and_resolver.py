@@ -2,15 +2,13 @@ from typing import Iterable
 from django.db.models import Model
 from django.db.models.query import QuerySet
 from sightings.filters.base import BaseFilterResolver, BaseFilter
+from sightings.filters.boolean import AndFilter
 
 
 class AndResolver(BaseFilterResolver):
     """
     Combine filters by ANDing their results and return the resulting queryset.
+    The filters are compiled into a single WHERE clause, so resolving them costs one query.
     """
     def resolve(self, filters: Iterable[BaseFilter], model: Model) -> QuerySet:
-        qs = model.objects.all()
-        for f in filters:
-            qs = f.filter_qs(query_set=qs)
-
-        return qs
+        return AndFilter(filters).filter_qs(model.objects.all())
@@ -1,17 +1,14 @@
 from typing import Iterable
-from django.db.models import Model, Q
+from django.db.models import Model
 from django.db.models.query import QuerySet
 from sightings.filters.base import BaseFilterResolver, BaseFilter
+from sightings.filters.boolean import OrFilter
 
 
 class OrResolver(BaseFilterResolver):
     """
     Combine filters by ORing their results and return the resulting queryset.
+    The filters are compiled into a single WHERE clause, so resolving them costs one query.
     """
     def resolve(self, filters: Iterable[BaseFilter], model: Model) -> QuerySet:
-        qs = model.objects.all()
-        query = Q()
-        for f in filters:
-            query |= f.get_query()
-
-        return qs.filter(query)
+        return OrFilter(filters).filter_qs(model.objects.all())
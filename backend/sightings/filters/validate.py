@@ -1,11 +1,13 @@
 from typing import List
 from sightings.filters.base import BaseFilter
+from sightings.filters.boolean import AndFilter, OrFilter, NotFilter
 from sightings.filters.locations import (
     LocationExactFilter,
     LocationQueryStringFilter,
-    DistanceFromFilter
+    DistanceFromFilter,
+    WithinBoundsFilter,
 )
-from sightings.gql.types.location import LocationFilterInput
+from sightings.gql.types.location import LocationFilterInput, LocationFilterExpressionInput
 
 
 def validate_filters(filters: List[BaseFilter]) -> bool:
@@ -22,6 +24,9 @@ def validate_filters(filters: List[BaseFilter]) -> bool:
 
 def get_location_filters(linput: LocationFilterInput):
     ret = []
+    if linput is None:
+        return ret
+
     if linput.city_exact or linput.state_exact or linput.country_exact or linput.state_name_exact:
         ret.append(
             LocationExactFilter(
@@ -45,4 +50,32 @@ def get_location_filters(linput: LocationFilterInput):
             )
         )
 
+    if linput.within_bounds:
+        ret.append(
+            WithinBoundsFilter(
+                west=linput.within_bounds.west,
+                south=linput.within_bounds.south,
+                east=linput.within_bounds.east,
+                north=linput.within_bounds.north,
+            )
+        )
+
     return ret
+
+
+def get_location_filter_tree(expression: LocationFilterExpressionInput) -> BaseFilter:
+    """
+    Build the filter tree described by a LocationFilterExpressionInput
+    :param expression:
+    :return:
+    """
+    expression.validate()
+
+    if expression.filter is not None:
+        return AndFilter(get_location_filters(linput=expression.filter))
+    if expression.and_ is not None:
+        return AndFilter(get_location_filter_tree(e) for e in expression.and_)
+    if expression.or_ is not None:
+        return OrFilter(get_location_filter_tree(e) for e in expression.or_)
+
+    return NotFilter(get_location_filter_tree(expression.not_))
@@ -0,0 +1,2 @@
+from .cost import QueryCostExtension
+from .tracing import TracingExtension
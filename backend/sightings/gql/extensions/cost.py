@@ -0,0 +1,183 @@
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from graphql import (
+    ExecutionResult,
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLNamedType,
+    SelectionSetNode,
+    get_named_type,
+    get_nullable_type,
+    is_leaf_type,
+    is_list_type,
+    is_object_type,
+)
+from graphql.utilities import get_operation_ast, value_from_ast_untyped
+from strawberry.extensions import Extension
+from strawberry_django_plus.settings import config
+
+
+# cost of resolving a field once, by "Type.field", or by "field" for every type. Object fields cost 1 and scalar
+# fields 0 unless listed here.
+FIELD_WEIGHTS = {
+    'totalCount': 1,
+    'RootQuery.nearestLocations': 2,
+    'RootQuery.sightingClusters': 10,
+    'RootQuery.sightingDensity': 10,
+    'RootMutation.createNewLocation': 10,
+}
+
+# arguments bounding the length of a list field
+LIST_SIZE_ARGUMENTS = ('first', 'last', 'k', 'limit')
+
+# error code of the operations refused for their cost or depth
+QUERY_TOO_COMPLEX = 'QUERY_TOO_COMPLEX'
+
+
+def _is_connection(graphql_type: GraphQLNamedType) -> bool:
+    return is_object_type(graphql_type) and 'edges' in graphql_type.fields and 'pageInfo' in graphql_type.fields
+
+
+class QueryCost:
+    """
+    Static cost of an operation. Every field costs its weight, times the number of items for list fields: the
+    first/last argument of a connection for its edges (RELAY_MAX_RESULTS if neither is given), a first, last, k or
+    limit argument for plain lists, QUERY_COST_LIST_SIZE otherwise. Nested selections multiply.
+    """
+    def __init__(self, schema, document, variables: Optional[Dict[str, Any]]):
+        self.schema = schema
+        self.variables = variables or {}
+        self.fragments: Dict[str, FragmentDefinitionNode] = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    def _argument(self, node: FieldNode, name: str) -> Any:
+        for argument in node.arguments or ():
+            if argument.name.value == name:
+                return value_from_ast_untyped(argument.value, self.variables)
+
+        return None
+
+    def _list_size(self, node: FieldNode) -> int:
+        for name in LIST_SIZE_ARGUMENTS:
+            value = self._argument(node, name)
+            if isinstance(value, int):
+                return value
+
+        return settings.QUERY_COST_LIST_SIZE
+
+    def _connection_size(self, node: FieldNode) -> int:
+        for name in ('first', 'last'):
+            value = self._argument(node, name)
+            if isinstance(value, int):
+                return value
+
+        return config.RELAY_MAX_RESULTS
+
+    def selection_set(self, parent_type, selection_set: SelectionSetNode, depth: int = 1,
+                      size: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Return (cost, depth) of a selection set on parent_type. size is the number of items of list fields in the
+        selection set, given for the edges of a connection.
+        """
+        cost, max_depth = 0, depth - 1
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                field_cost, field_depth = self.field(parent_type, selection, depth, size)
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    fragment = self.fragments[selection.name.value]
+                else:
+                    fragment = selection
+                fragment_type = parent_type
+                if fragment.type_condition is not None:
+                    fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                field_cost, field_depth = self.selection_set(fragment_type, fragment.selection_set, depth, size)
+
+            cost += field_cost
+            max_depth = max(max_depth, field_depth)
+
+        return cost, max_depth
+
+    def field(self, parent_type, node: FieldNode, depth: int, size: Optional[int]) -> Tuple[int, int]:
+        name = node.name.value
+        definition = getattr(parent_type, 'fields', {}).get(name)
+        if definition is None:
+            # __typename and introspection
+            return 0, depth
+
+        field_type = get_named_type(definition.type)
+        weight = FIELD_WEIGHTS.get(f'{parent_type.name}.{name}', FIELD_WEIGHTS.get(name))
+        if weight is None:
+            weight = 0 if is_leaf_type(field_type) else 1
+
+        cost, max_depth = weight, depth
+        if node.selection_set is not None:
+            child_size = self._connection_size(node) if _is_connection(field_type) else None
+            child_cost, max_depth = self.selection_set(field_type, node.selection_set, depth + 1, child_size)
+            cost += child_cost
+
+        if is_list_type(get_nullable_type(definition.type)):
+            cost *= size if size is not None else self._list_size(node)
+
+        return cost, max_depth
+
+
+class QueryCostExtension(Extension):
+    """
+    Compute the static cost and depth of every operation, see QueryCost, and refuse to execute operations costing
+    more than QUERY_COST_BUDGET or nested deeper than QUERY_MAX_DEPTH. Both are reported in the "cost" entry of
+    the response extensions.
+    """
+    cost: Optional[int] = None
+    depth: Optional[int] = None
+
+    def on_executing_start(self):
+        execution_context = self.execution_context
+        document = execution_context.graphql_document
+        operation = get_operation_ast(document, execution_context.operation_name)
+        if operation is None:
+            return
+
+        schema = execution_context.schema._schema
+        root_type = schema.get_root_type(operation.operation)
+        self.cost, self.depth = QueryCost(schema, document, execution_context.variables).selection_set(
+            root_type, operation.selection_set
+        )
+
+        if self.cost > settings.QUERY_COST_BUDGET:
+            message = f'Query cost {self.cost} exceeds the budget of {settings.QUERY_COST_BUDGET}'
+        elif self.depth > settings.QUERY_MAX_DEPTH:
+            message = f'Query depth {self.depth} exceeds the maximum of {settings.QUERY_MAX_DEPTH}'
+        else:
+            return
+
+        error = GraphQLError(message, extensions={'code': QUERY_TOO_COMPLEX})
+        execution_context.errors = [error]
+        # a result set before execution stops it from running
+        execution_context.result = ExecutionResult(data=None, errors=[error])
+
+    @staticmethod
+    def unexpected_errors(errors: List[GraphQLError]) -> List[GraphQLError]:
+        """
+        Return the errors other than the refusals of this extension, which are answers to the client rather than
+        server faults and are kept out of the error log
+        """
+        return [error for error in errors if (error.extensions or {}).get('code') != QUERY_TOO_COMPLEX]
+
+    def get_results(self) -> Dict[str, Any]:
+        if self.cost is None:
+            return {}
+
+        return {
+            'cost': {
+                'requested': self.cost,
+                'budget': settings.QUERY_COST_BUDGET,
+                'depth': self.depth,
+                'maxDepth': settings.QUERY_MAX_DEPTH,
+            }
+        }
@@ -0,0 +1,166 @@
+import dataclasses
+import json
+import logging
+from contextlib import ExitStack
+from typing import Any, Dict, List, Optional
+from django.conf import settings
+from django.db import connections
+from strawberry.extensions.tracing.apollo import ApolloResolverStats, ApolloTracingExtensionSync
+from strawberry.extensions.utils import get_path_from_info, is_introspection_field
+
+
+logger = logging.getLogger(__name__)
+
+NS_PER_MS = 1_000_000
+
+
+@dataclasses.dataclass
+class SQLQueryStats:
+    sql: str
+    start_offset: int
+    duration: int
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'sql': self.sql, 'startOffset': self.start_offset, 'duration': self.duration}
+
+
+@dataclasses.dataclass
+class TracedResolverStats(ApolloResolverStats):
+    queries: List[SQLQueryStats] = dataclasses.field(default_factory=list)
+
+    def to_json(self) -> Dict[str, Any]:
+        data = super().to_json()
+        data['queries'] = [query.to_json() for query in self.queries]
+        return data
+
+
+def _ms(duration: int) -> float:
+    return round(duration / NS_PER_MS, 3)
+
+
+def _field_path(path: List[Any]) -> str:
+    # list indices are dropped so that the resolvers of every item of a list add up under one path
+    return '.'.join(str(key) for key in path if not isinstance(key, int))
+
+
+class TracingExtension(ApolloTracingExtensionSync):
+    """
+    Time the parsing, validation and every resolver of an operation, and attribute each SQL query to the resolver
+    that issued it. Requests carrying the GRAPHQL_TRACING_HEADER header get an Apollo tracing compatible
+    "tracing" entry in the response extensions, with the queries of each resolver, when DEBUG is on or the user is
+    staff. When GRAPHQL_TRACING is set, other operations are summarized in a JSON log record, listing the slowest
+    resolver paths, if the logger of this module is enabled for INFO.
+    """
+    def __init__(self, execution_context):
+        super().__init__(execution_context)
+        self.debug = False
+        self.enabled = False
+        self._current: Optional[TracedResolverStats] = None
+        self._unattributed: List[SQLQueryStats] = []
+        self._wrappers = ExitStack()
+
+    def _debug_requested(self) -> bool:
+        request = getattr(self.execution_context.context, 'request', None)
+        if request is None or settings.GRAPHQL_TRACING_HEADER not in request.headers:
+            return False
+
+        return settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False)
+
+    def on_request_start(self):
+        self.debug = self._debug_requested()
+        self.enabled = self.debug or (settings.GRAPHQL_TRACING and logger.isEnabledFor(logging.INFO))
+        super().on_request_start()
+        if self.enabled:
+            for connection in connections.all():
+                self._wrappers.enter_context(connection.execute_wrapper(self._record_query))
+
+    def on_request_end(self):
+        self._wrappers.close()
+        super().on_request_end()
+        if self.enabled and not self.debug:
+            logger.info(json.dumps(self.summary()))
+
+    def on_executing_start(self):
+        self._start_executing = self.now()
+
+    def on_executing_end(self):
+        self._end_executing = self.now()
+
+    def _record_query(self, execute, sql, params, many, context):
+        start = self.now()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            query = SQLQueryStats(sql=sql, start_offset=start - self.start_timestamp, duration=self.now() - start)
+            if self._current is not None:
+                self._current.queries.append(query)
+            else:
+                self._unattributed.append(query)
+
+    def resolve(self, _next, root, info, *args, **kwargs):
+        if not self.enabled or is_introspection_field(info):
+            return _next(root, info, *args, **kwargs)
+
+        start_timestamp = self.now()
+        resolver_stats = TracedResolverStats(
+            path=get_path_from_info(info),
+            field_name=info.field_name,
+            parent_type=info.parent_type,
+            return_type=info.return_type,
+            start_offset=start_timestamp - self.start_timestamp,
+        )
+
+        previous, self._current = self._current, resolver_stats
+        try:
+            return _next(root, info, *args, **kwargs)
+        finally:
+            resolver_stats.duration = self.now() - start_timestamp
+            self._current = previous
+            self._resolver_stats.append(resolver_stats)
+
+    def _step(self, name: str) -> Optional[float]:
+        start, end = getattr(self, f'_start_{name}', None), getattr(self, f'_end_{name}', None)
+        return _ms(end - start) if start is not None and end is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Timings of the operation in milliseconds, with its SQL queries and the slowest resolver paths
+        """
+        paths: Dict[str, Dict[str, Any]] = {}
+        queries = list(self._unattributed)
+        for stats in self._resolver_stats:
+            queries.extend(stats.queries)
+            path = paths.setdefault(_field_path(stats.path), {'calls': 0, 'duration': 0, 'queries': 0, 'sql': 0})
+            path['calls'] += 1
+            path['duration'] += stats.duration
+            path['queries'] += len(stats.queries)
+            path['sql'] += sum(query.duration for query in stats.queries)
+
+        slowest = sorted(paths.items(), key=lambda item: item[1]['duration'], reverse=True)
+        return {
+            'operation': self.execution_context.operation_name,
+            'duration': _ms(self.end_timestamp - self.start_timestamp),
+            'parsing': self._step('parsing'),
+            'validation': self._step('validation'),
+            'execution': self._step('executing'),
+            'queries': len(queries),
+            'sql': _ms(sum(query.duration for query in queries)),
+            'resolvers': [
+                {
+                    'path': name,
+                    'calls': path['calls'],
+                    'duration': _ms(path['duration']),
+                    'queries': path['queries'],
+                    'sql': _ms(path['sql']),
+                }
+                for name, path in slowest[:settings.GRAPHQL_TRACING_LOG_RESOLVERS]
+            ],
+        }
+
+    def get_results(self) -> Dict[str, Any]:
+        if not self.debug:
+            return {}
+
+        results = super().get_results()
+        results['tracing']['sql'] = [query.to_json() for query in self._unattributed]
+        return results
@@ -0,0 +1,91 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from django.core.cache import cache
+from sightings.helpers.metrics import count_cache_lookup
+
+
+# automatic persisted queries, https://github.com/apollographql/apollo-link-persisted-queries#protocol
+PERSISTED_QUERY_VERSION = 1
+
+
+class PersistedQueryError(Exception):
+    """
+    Raised when a request references a persisted query that cannot be used. message and code are sent back as a
+    GraphQL error, clients answer PersistedQueryNotFound by resending the hash with the full query.
+    """
+    def __init__(self, message: str, code: str, status: int = 200):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.status = status
+
+    def as_response_data(self) -> Dict[str, Any]:
+        return {'errors': [{'message': self.message, 'extensions': {'code': self.code}}]}
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def persisted_query_key(sha256_hash: str) -> str:
+    return f'persisted-query:{sha256_hash}'
+
+
+def register_persisted_query(query: str) -> str:
+    """
+    Add a query to the registered query map and return its hash
+    """
+    sha256_hash = query_hash(query)
+    cache.set(persisted_query_key(sha256_hash), query, timeout=None)
+    return sha256_hash
+
+
+def get_persisted_query(sha256_hash: str) -> Optional[str]:
+    return cache.get(persisted_query_key(sha256_hash))
+
+
+def _persisted_query_extension(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    extensions = data.get('extensions')
+    if isinstance(extensions, str):
+        # GET requests carry extensions as a JSON encoded query parameter
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise PersistedQueryError('Invalid extensions', 'BAD_REQUEST', status=400)
+
+    if not isinstance(extensions, dict):
+        return None
+
+    return extensions.get('persistedQuery')
+
+
+def resolve_persisted_query(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in the query of a request body that references a persisted query by its sha256 hash, registering the
+    query first when the body carries both. Bodies without a persistedQuery extension are returned unchanged.
+    """
+    persisted_query = _persisted_query_extension(data)
+    if persisted_query is None:
+        return data
+
+    if not isinstance(persisted_query, dict) or persisted_query.get('version') != PERSISTED_QUERY_VERSION:
+        raise PersistedQueryError('PersistedQueryNotSupported', 'PERSISTED_QUERY_NOT_SUPPORTED', status=400)
+
+    sha256_hash = persisted_query.get('sha256Hash')
+    if not isinstance(sha256_hash, str):
+        raise PersistedQueryError('Invalid persisted query hash', 'BAD_REQUEST', status=400)
+
+    query = data.get('query')
+    if query:
+        if query_hash(query) != sha256_hash:
+            raise PersistedQueryError('provided sha does not match query', 'BAD_REQUEST', status=400)
+        register_persisted_query(query)
+        return data
+
+    query = get_persisted_query(sha256_hash)
+    count_cache_lookup('persisted_queries', query is not None)
+    if query is None:
+        raise PersistedQueryError('PersistedQueryNotFound', 'PERSISTED_QUERY_NOT_FOUND')
+
+    return {**data, 'query': query}
@@ -1,14 +1,22 @@
-from typing import Optional, Iterable
+from typing import Optional, Iterable, List
 from strawberry_django_plus import gql
 from sightings.gql.types.location import (
     LocationNode,
     LocationFilterInput,
+    LocationFilterExpressionInput,
+    NearbyLocation,
+    LocationSuggestion,
 )
-from sightings.helpers.common import get_order_by_field
+from sightings.helpers.geocoding import find_nearest_locations
+from sightings.helpers.search import order_by_search_rank
+from sightings.helpers.sorting import LOCATION_SORTS, sort_queryset
+from sightings.helpers.suggestions import suggest_location_names
 from sightings.gql.types.sorting import SortInput
+from sightings.gql.types.connection import keyset_connection
 from sightings.models import Location
+from sightings.filters.boolean import AndFilter
 from sightings.filters.resolvers.and_resolver import AndResolver
-from sightings.filters.validate import validate_filters, get_location_filters
+from sightings.filters.validate import validate_filters, get_location_filters, get_location_filter_tree
 
 
 @gql.type
@@ -17,26 +25,75 @@ class Query:
         description="A node representing a geographic location",
     )
 
-    @gql.relay.connection(
+    @keyset_connection(
         description="A collection of nodes representing geographic locations",
     )
     def location_connection(
         self,
         location_filter: Optional[LocationFilterInput] = None,
+        location_filter_expression: Optional[LocationFilterExpressionInput] = None,
         sort: Optional[SortInput] = None
     ) -> Iterable[LocationNode]:
         """
         Filterable location connection
         :param location_filter: LocationFilterInput object
-        :param sort: SortInput object
+        :param location_filter_expression: LocationFilterExpressionInput object, ANDed with location_filter
+        :param sort: SortInput object, locations matching location_filter.q are ordered by relevance by default
         """
         filters = get_location_filters(linput=location_filter)
+        if location_filter_expression:
+            filters.append(get_location_filter_tree(location_filter_expression))
         validate_filters(filters)
 
         locations = AndResolver().resolve(filters=filters, model=Location)
 
         if sort:
-            order = get_order_by_field(sort.order, sort.field)
-            locations = locations.order_by(order)
+            bounded_area = AndFilter(filters).bounded_area()
+            locations = sort_queryset(locations, sort, LOCATION_SORTS, bounded_area=bounded_area)
+        elif location_filter and location_filter.q and location_filter.q.strip():
+            locations = order_by_search_rank(locations, location_filter.q)
 
         return locations
+
+    @gql.field(
+        description="The k locations nearest to a point, nearest first",
+    )
+    def nearest_locations(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 10
+    ) -> List[NearbyLocation]:
+        """
+        Nearest locations to (latitude, longitude), served from the in-process spatial index
+        :param latitude: latitude of the point
+        :param longitude: longitude of the point
+        :param k: maximum number of locations to return
+        """
+        return [
+            NearbyLocation(location=location, distance=dist)
+            for dist, location in find_nearest_locations(latitude, longitude, k)
+        ]
+
+    @gql.field(
+        description="Distinct city, state and country names starting with a prefix, most sighted first",
+    )
+    def location_suggestions(
+        self,
+        prefix: str,
+        limit: int = 10
+    ) -> List[LocationSuggestion]:
+        """
+        Autocomplete location names, served from the in-process suggestion trie
+        :param prefix: case-insensitive name prefix
+        :param limit: maximum number of suggestions to return
+        """
+        return [
+            LocationSuggestion(
+                kind=s.kind,
+                name=s.name,
+                location_count=s.location_count,
+                sighting_count=s.sighting_count,
+            )
+            for s in suggest_location_names(prefix, limit)
+        ]
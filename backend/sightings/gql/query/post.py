@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Optional, Iterable
 from strawberry_django_plus import gql
 from sightings.gql.types.post import PostNode
+from sightings.gql.types.connection import keyset_connection
+from sightings.models import Post
 
 
 @gql.type
 class Query:
     post: Optional[PostNode] = gql.relay.node()
-    post_connection: gql.relay.Connection[PostNode] = gql.relay.connection()
+
+    @keyset_connection()
+    def post_connection(self) -> Iterable[PostNode]:
+        """
+        Post connection
+        """
+        return Post.objects.all()
@@ -1,9 +1,17 @@
-from typing import Optional, Iterable
+from datetime import date
+from typing import Optional, Iterable, List
 from strawberry_django_plus import gql
-from sightings.gql.types.sighting import SightingNode
+from strawberry_django_plus.relay import to_base64
+from sightings.gql.types.sighting import SightingNode, SightingCluster, SightingDensitySlice
 from sightings.gql.types.sighting import SightingFilterInput
+from sightings.gql.types.location import BoundsInput
 from sightings.gql.types.sorting import SortInput
+from sightings.gql.types.connection import keyset_connection
 from sightings.helpers.sighting import sightings_filter_sort
+from sightings.helpers.clustering import cluster_sightings
+from sightings.helpers.density import density_slice
+from sightings.helpers.tiles import MAX_TILE_ZOOM
+from sightings.exceptions import SightingInputValidationException, DatetimeInputValidationException
 
 
 @gql.type
@@ -12,7 +20,7 @@ class Query:
         description="A node representing a single ufo sighting"
     )
 
-    @gql.relay.connection(
+    @keyset_connection(
         description="A collection of nodes representing ufo sightings"
     )
     def sighting_connection(
@@ -33,3 +41,54 @@ class Query:
             sighting_filter=sighting_filter,
             sort=sort
         )
+
+    @gql.field(
+        description="Sightings grouped into grid cells for the given zoom level"
+    )
+    def sighting_clusters(
+        self,
+        bounds: BoundsInput,
+        zoom: int
+    ) -> List[SightingCluster]:
+        """
+        Server side clustering of the sightings inside bounds
+        :param bounds: BoundsInput object, usually the camera view
+        :param zoom: tile zoom level, from 0 to MAX_TILE_ZOOM
+        """
+        bounds.validate()
+        if not 0 <= zoom <= MAX_TILE_ZOOM:
+            raise SightingInputValidationException(f'zoom must be between 0 and {MAX_TILE_ZOOM}, got {zoom}')
+
+        clusters = cluster_sightings(zoom, bounds.west, bounds.south, bounds.east, bounds.north)
+        return [
+            SightingCluster(
+                latitude=cluster['latitude'],
+                longitude=cluster['longitude'],
+                count=cluster['count'],
+                representative_id=to_base64(SightingNode.__name__, cluster['representative']),
+            )
+            for cluster in clusters
+        ]
+
+    @gql.field(
+        description="Sighting counts per grid cell and month, read from the precomputed density cube"
+    )
+    def sighting_density(
+        self,
+        bounds: BoundsInput,
+        start: date,
+        end: date
+    ) -> SightingDensitySlice:
+        """
+        Slice of the sighting density cube
+        :param bounds: BoundsInput object
+        :param start: first month of the slice
+        :param end: last month of the slice
+        """
+        bounds.validate()
+        if start > end:
+            raise DatetimeInputValidationException('end must be greater than start.')
+
+        return SightingDensitySlice(
+            **density_slice(bounds.west, bounds.south, bounds.east, bounds.north, start, end)
+        )
@@ -0,0 +1,131 @@
+from typing import Any, List, Optional, Tuple
+from django.db.models import QuerySet
+from strawberry.annotation import StrawberryAnnotation
+from strawberry.arguments import StrawberryArgument
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField
+from strawberry_django_plus import optimizer
+from strawberry_django_plus.permissions import filter_with_perms
+from strawberry_django_plus.relay import Connection, ConnectionField, Edge, PageInfo
+from strawberry_django_plus.settings import config
+from strawberry_django_plus.utils.inspect import get_django_type
+from sightings.gql.types.counting import CountMode
+from sightings.helpers.counting import count_queryset
+from sightings.helpers.keyset import keyset_page
+from sightings.helpers.result_cache import get_cached_result, result_cache_key, set_cached_result
+
+
+def _selects(selections, name: str) -> bool:
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            if selection.name == name:
+                return True
+        # inline fragments and named fragment spreads, whose name is the fragment's, select fields of this type
+        elif _selects(selection.selections, name):
+            return True
+
+    return False
+
+
+class KeysetConnectionField(ConnectionField):
+    """
+    Connection field taking a countMode argument next to the pagination arguments, and passing it on to
+    KeysetNode.resolve_connection
+    """
+    default_args = {
+        **ConnectionField.default_args,
+        'count_mode': StrawberryArgument(
+            python_name='count_mode',
+            graphql_name=None,
+            type_annotation=StrawberryAnnotation(CountMode),
+            description='How totalCount is computed.',
+            default=CountMode.EXACT,
+        ),
+    }
+
+
+def keyset_connection(resolver=None, *, name: Optional[str] = None, description: Optional[str] = None) -> Any:
+    """
+    Declare a KeysetConnectionField, like gql.relay.connection
+    """
+    field = KeysetConnectionField(python_name=None, graphql_name=name, type_annotation=None, description=description)
+    return field(resolver) if resolver is not None else field
+
+
+class KeysetNode:
+    """
+    Mixin for Django relay node types, paginating their connections by keyset instead of OFFSET.
+    Cursors encode the sort key values and primary key of a row, so fetching the page after a cursor is an indexed
+    seek whatever its depth. totalCount is only computed when it is selected, as chosen by the countMode argument
+    of connections declared with keyset_connection. When RESULT_CACHE_ENABLED is set, pages of the connections
+    listed in CACHED_CONNECTIONS are kept in the results cache until one of the models they depend on is written to,
+    except those selecting an EXACT totalCount.
+    """
+    @classmethod
+    def _fetch_page(
+        cls,
+        nodes: QuerySet,
+        info: Info,
+        field,
+        total_count: Optional[int],
+        count_mode: CountMode,
+        before: Optional[str],
+        after: Optional[str],
+        first: Optional[int],
+        last: Optional[int],
+    ) -> Tuple[list, List[str], bool, bool, Optional[int]]:
+        if total_count is None and _selects(field.selections, 'totalCount'):
+            total_count = count_queryset(nodes, count_mode)
+
+        ext = optimizer.optimizer.get()
+        if ext is not None:
+            nodes = ext.optimize(nodes, info=info)
+
+        rows, cursors, has_previous_page, has_next_page = keyset_page(
+            nodes,
+            before=before,
+            after=after,
+            first=first,
+            last=last,
+            max_results=config.RELAY_MAX_RESULTS,
+        )
+        return rows, cursors, has_previous_page, has_next_page, total_count
+
+    @classmethod
+    def resolve_connection(
+        cls,
+        *,
+        info: Info,
+        nodes: Optional[QuerySet] = None,
+        total_count: Optional[int] = None,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        first: Optional[int] = None,
+        last: Optional[int] = None,
+        count_mode: CountMode = CountMode.EXACT,
+    ) -> Connection:
+        if nodes is None:
+            nodes = get_django_type(cls, ensure_type=True).model._default_manager.all()
+
+        nodes = filter_with_perms(nodes, info)
+        field = info.selected_fields[0]
+        # an EXACT totalCount is counted on every request
+        exact = count_mode == CountMode.EXACT and _selects(field.selections, 'totalCount')
+        key = result_cache_key(nodes.model, field) if total_count is None and not exact else None
+        page = get_cached_result(key)
+        if page is None:
+            page = cls._fetch_page(nodes, info, field, total_count, count_mode, before, after, first, last)
+            set_cached_result(key, page)
+
+        rows, cursors, has_previous_page, has_next_page, total_count = page
+        edges = [Edge(cursor=cursor, node=row) for row, cursor in zip(rows, cursors)]
+        return Connection(
+            edges=edges,
+            page_info=PageInfo(
+                start_cursor=cursors[0] if cursors else None,
+                end_cursor=cursors[-1] if cursors else None,
+                has_previous_page=has_previous_page,
+                has_next_page=has_next_page,
+            ),
+            total_count=total_count,
+        )
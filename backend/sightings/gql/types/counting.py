@@ -0,0 +1,15 @@
+from strawberry_django_plus import gql
+from enum import Enum
+
+
+@gql.enum
+class CountMode(Enum):
+    """
+    How the totalCount of a connection is computed
+    EXACT - COUNT(*) on every request
+    ESTIMATED - database statistics on Postgres, CACHED elsewhere
+    CACHED - exact count, reused until the counted models are written to
+    """
+    EXACT = "EXACT"
+    ESTIMATED = "ESTIMATED"
+    CACHED = "CACHED"
@@ -16,7 +16,7 @@ class DateRangeFilterInput:
 @gql.input
 class TimeRangeFilterInput:
     """
-    Input type representing a range of times
+    Input type representing a range of times. If time_start is later than time_end, the range wraps midnight.
     """
     time_start: time
     time_end: time
@@ -25,7 +25,8 @@ class TimeRangeFilterInput:
 @gql.input
 class DateTimeFilterInput:
     """
-    Input type for filtering based on different datetime options
+    Input type for filtering based on different datetime options. Times of day are compared in the server time zone.
+    If time_after is later than time_before, the range wraps midnight.
     """
     datetime_after: Optional[datetime] = None
     datetime_before: Optional[datetime] = None
@@ -53,7 +54,7 @@ class DateTimeFilterInput:
                                                    'timeInRange.')
         if (self.datetime_before and self.datetime_after) and self.datetime_before < self.datetime_after:
             raise DatetimeInputValidationException('datetimeBefore must be greater than datetimeAfter.')
-        if (self.time_before and self.time_after) and self.time_before < self.time_after:
-            raise DatetimeInputValidationException('timeBefore must be greater than timeAfter.')
+        if self.datetime_in_range and self.datetime_in_range.date_end < self.datetime_in_range.date_start:
+            raise DatetimeInputValidationException('dateEnd must be greater than dateStart.')
 
         return True
@@ -1,7 +1,10 @@
-from typing import Optional
+from typing import List, Optional
 from strawberry import auto
 from strawberry_django_plus import gql
+from sightings.gql.types.connection import KeysetNode
 from sightings.models import Location
+from sightings.helpers.geocoding import validate_bounds
+from sightings.exceptions import LocationInputValidationException
 
 
 NORTHERN = 'northern'
@@ -13,25 +16,25 @@ HEMISPHERES = {
     NORTHERN: {
         "longitude": 0,
         "latitude": 90,
-        "arc_length": 10001965.729,
+        "arc_length": 10007557.176,
         "inside_circle": True,
     },
     SOUTHERN: {
         "longitude": 0,
         "latitude": 90,
-        "arc_length": 10001965.729,
+        "arc_length": 10007557.176,
         "inside_circle": False,
     },
     EASTERN: {
         "longitude": 90,
         "latitude": 0,
-        "arc_length": 10018754.25,
+        "arc_length": 10007557.176,
         "inside_circle": True,
     },
     WESTERN: {
         "longitude": 90,
         "latitude": 0,
-        "arc_length": 10018754.25,
+        "arc_length": 10007557.176,
         "inside_circle": False,
     },
 }
@@ -53,6 +56,30 @@ class DistanceFromInput:
     inside_circle: bool
 
 
+@gql.input
+class BoundsInput:
+    """
+    Input object describing a latitude/longitude rectangle, such as the current camera view.
+    west, east - bounding longitudes. If west is greater than east, the rectangle crosses the antimeridian.
+    south, north - bounding latitudes
+    """
+    west: float
+    south: float
+    east: float
+    north: float
+
+    def validate(self) -> bool:
+        """
+        Return True if this BoundsInput object is valid, raise exception otherwise
+        """
+        if not validate_bounds(self.west, self.south, self.east, self.north):
+            raise LocationInputValidationException(
+                f'Invalid bounds: ({self.west}, {self.south}, {self.east}, {self.north})'
+            )
+
+        return True
+
+
 @gql.input
 class LocationFilterInput:
     """
@@ -63,9 +90,37 @@ class LocationFilterInput:
     state_name_exact: Optional[str] = None
     country_exact: Optional[str] = None
     distance_from: Optional[DistanceFromInput] = None
+    within_bounds: Optional[BoundsInput] = None
     q: Optional[str] = None
 
 
+@gql.input
+class LocationFilterExpressionInput:
+    """
+    Boolean expression over location filters, evaluated as a single query. Exactly one field must be set.
+    filter - a LocationFilterInput, whose own fields are ANDed together
+    and - matches locations matched by every sub-expression
+    or - matches locations matched by at least one sub-expression
+    not - matches locations not matched by the sub-expression
+    """
+    filter: Optional[LocationFilterInput] = None
+    and_: Optional[List["LocationFilterExpressionInput"]] = gql.field(name="and", default=None)
+    or_: Optional[List["LocationFilterExpressionInput"]] = gql.field(name="or", default=None)
+    not_: Optional["LocationFilterExpressionInput"] = gql.field(name="not", default=None)
+
+    def validate(self) -> bool:
+        """
+        Return True if exactly one field of this expression is set, raise exception otherwise
+        """
+        given = [v for v in (self.filter, self.and_, self.or_, self.not_) if v is not None]
+        if len(given) != 1:
+            raise LocationInputValidationException(
+                'Exactly one of filter, and, or, not must be given in a location filter expression'
+            )
+
+        return True
+
+
 @gql.django.type(Location)
 class LocationType:
     """
@@ -81,7 +136,7 @@ class LocationType:
 
 
 @gql.django.type(Location)
-class LocationNode(gql.relay.Node):
+class LocationNode(KeysetNode, gql.relay.Node):
     """
     GQL type definition for Location Nodes
     """
@@ -91,3 +146,26 @@ class LocationNode(gql.relay.Node):
     city: auto
     state: auto
     state_name: auto
+
+
+@gql.type
+class NearbyLocation:
+    """
+    A location together with its distance, in meters, from a point
+    """
+    location: LocationNode
+    distance: float
+
+
+@gql.type
+class LocationSuggestion:
+    """
+    A distinct location name matching an autocomplete prefix
+    kind - the location field the name comes from: city, state, state_name or country
+    location_count - number of locations with this name
+    sighting_count - number of sightings at those locations
+    """
+    kind: str
+    name: str
+    location_count: int
+    sighting_count: int
@@ -1,12 +1,13 @@
 from strawberry import auto
 from strawberry_django_plus import gql
+from sightings.gql.types.connection import KeysetNode
 from sightings.gql.types.sighting import SightingNode
 from sightings.gql.types.user import UserNode
 from sightings.models import Post
 
 
 @gql.django.type(Post)
-class PostNode(gql.relay.Node):
+class PostNode(KeysetNode, gql.relay.Node):
     """
     GQL type definition for a Post Node
     """
@@ -1,8 +1,10 @@
-from typing import Optional
+from datetime import date
+from typing import List, Optional
 from strawberry import auto
 from strawberry_django_plus import gql
+from sightings.gql.types.connection import KeysetNode
 from sightings.models import Sighting
-from sightings.gql.types.location import LocationNode, LocationFilterInput
+from sightings.gql.types.location import LocationNode, LocationFilterInput, BoundsInput
 from sightings.gql.types.datetime import DateTimeFilterInput
 from sightings.exceptions import SightingInputValidationException
 
@@ -14,6 +16,7 @@ class SightingFilterInput:
     """
     location_filter: Optional[LocationFilterInput] = None
     datetime_filter: Optional[DateTimeFilterInput] = None
+    within_bounds: Optional[BoundsInput] = None
     location_ids: Optional[str] = None  # filter by a list of location global ids
 
     def validate(self) -> bool:
@@ -23,6 +26,9 @@ class SightingFilterInput:
         if self.location_filter and self.location_ids:
             raise SightingInputValidationException("Cannot specify both locationFilter and locationIds")
 
+        if self.within_bounds:
+            self.within_bounds.validate()
+
         if self.datetime_filter:
             return self.datetime_filter.validate()
 
@@ -30,7 +36,7 @@ class SightingFilterInput:
 
 
 @gql.django.type(Sighting)
-class SightingNode(gql.relay.Node):
+class SightingNode(KeysetNode, gql.relay.Node):
     """
     GQL type definition for Sighting Nodes
     """
@@ -38,3 +44,37 @@ class SightingNode(gql.relay.Node):
     sighting_datetime: auto
     created_datetime: auto
     modified_datetime: auto
+
+
+@gql.type
+class SightingCluster:
+    """
+    A group of sightings sharing a grid cell at some zoom level
+    latitude, longitude - centroid of the clustered sightings
+    count - number of sightings in the cluster
+    representative_id - global id of one of the clustered sightings
+    """
+    latitude: float
+    longitude: float
+    count: int
+    representative_id: str
+
+
+@gql.type
+class SightingDensitySlice:
+    """
+    Part of the sighting density cube, as a dense [month][row][column] grid of sighting counts flattened into the
+    parallel arrays indices and counts. Only non-empty cells are listed.
+    cell_size - edge length of a grid cell, in degrees
+    west, south - coordinates of the south-west corner of the first grid cell
+    columns, rows - grid dimensions; columns run eastwards and rows run northwards
+    months - first day of each month of the slice
+    """
+    cell_size: float
+    west: float
+    south: float
+    columns: int
+    rows: int
+    months: List[date]
+    indices: List[int]
+    counts: List[int]
@@ -1,3 +1,4 @@
+from typing import Optional
 from strawberry_django_plus import gql
 from enum import Enum
 
@@ -8,7 +9,21 @@ class SortOrder(Enum):
     DES = "DES"
 
 
+@gql.input
+class PointInput:
+    """
+    Input type representing a point on the globe
+    """
+    latitude: float
+    longitude: float
+
+
 @gql.input
 class SortInput:
+    """
+    Input type for sorting a connection. field must be one of the sort keys registered for the connection, see
+    sightings.helpers.sorting. point is required when sorting by distance.
+    """
     order: SortOrder
     field: str
+    point: Optional[PointInput] = None
@@ -0,0 +1,47 @@
+import time
+from typing import Iterable, Type
+from django.core.cache import cache
+from django.db.models import Model
+
+
+def _initial_version() -> int:
+    # counters restart from the clock, so a counter that was evicted can never reuse an old version
+    return int(time.time() * 1000)
+
+
+def model_version_key(model: Type[Model]) -> str:
+    return f'model-version:{model._meta.label_lower}'
+
+
+def get_model_version(model: Type[Model]) -> int:
+    """
+    Return the current version counter of a model. Counters are bumped on every write to the model, so cache
+    keys that embed them are invalidated without having to find and delete the stale entries.
+    """
+    key = model_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key, 0)
+
+    return version
+
+
+def bump_model_version(model: Type[Model]):
+    """
+    Increment the version counter of a model
+    """
+    key = model_version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # the counter was never read or has been evicted
+        cache.add(key, _initial_version(), timeout=None)
+
+
+def versioned_key(prefix: str, models: Iterable[Type[Model]], *parts) -> str:
+    """
+    Build a cache key from a prefix and parts that becomes stale whenever one of the given models is written to
+    """
+    versions = '.'.join(str(get_model_version(model)) for model in models)
+    return ':'.join([prefix, versions, *map(str, parts)])
@@ -0,0 +1,107 @@
+from typing import Dict, List, Tuple
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, Min, Q
+from django.db.models.functions import Cast, Floor
+from sightings.models import Location, Sighting
+from sightings.exceptions import SightingInputValidationException
+from sightings.helpers.cache import versioned_key
+from sightings.helpers.tiles import tile_bounds, tile_count, tile_size, tiles_for_bounds
+
+
+# number of cluster cells along each edge of a tile
+CLUSTER_GRID_SIZE = 8
+
+# maximum number of tiles a single cluster request may touch
+MAX_CLUSTER_TILES = 64
+
+CLUSTER_CACHE_TIMEOUT = 60 * 60  # seconds
+
+
+def _aggregate_tiles(zoom: int, tiles: List[Tuple[int, int]]) -> Dict[Tuple[int, int], List[dict]]:
+    """
+    Group the sightings of several tiles into grid cells with a single aggregate query
+    """
+    cell = tile_size(zoom) / CLUSTER_GRID_SIZE
+    columns, rows = tile_count(zoom)
+    latitude = Cast('location__latitude', FloatField())
+    longitude = Cast('location__longitude', FloatField())
+
+    query = Q()
+    for x, y in tiles:
+        west, south, east, north = tile_bounds(zoom, x, y)
+        query |= Q(
+            location__latitude__gte=south,
+            location__latitude__lte=north,
+            location__longitude__gte=west,
+            location__longitude__lte=east,
+        )
+
+    cells = (
+        Sighting.objects
+        .filter(query)
+        .annotate(
+            cell_x=Floor((longitude + 180.0) / cell),
+            cell_y=Floor((90.0 - latitude) / cell),
+        )
+        .values('cell_x', 'cell_y')
+        .annotate(
+            count=Count('id'),
+            latitude=Avg(latitude),
+            longitude=Avg(longitude),
+            representative=Min('id'),
+        )
+    )
+
+    clusters = {tile: [] for tile in tiles}
+    merged = {}
+    for row in cells:
+        # points on the east/south edge of the globe belong to the last cell
+        cell_x = min(int(row['cell_x']), columns * CLUSTER_GRID_SIZE - 1)
+        cell_y = min(int(row['cell_y']), rows * CLUSTER_GRID_SIZE - 1)
+        tile = (cell_x // CLUSTER_GRID_SIZE, cell_y // CLUSTER_GRID_SIZE)
+        if tile not in clusters:
+            # points on a shared edge of a tile that was not requested
+            continue
+
+        cluster = merged.get((cell_x, cell_y))
+        if cluster is None:
+            cluster = merged[(cell_x, cell_y)] = {
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+                'count': row['count'],
+                'representative': row['representative'],
+            }
+            clusters[tile].append(cluster)
+        else:
+            total = cluster['count'] + row['count']
+            cluster['latitude'] = (cluster['latitude'] * cluster['count'] + row['latitude'] * row['count']) / total
+            cluster['longitude'] = (cluster['longitude'] * cluster['count'] + row['longitude'] * row['count']) / total
+            cluster['count'] = total
+            cluster['representative'] = min(cluster['representative'], row['representative'])
+
+    return clusters
+
+
+def cluster_sightings(zoom: int, west: float, south: float, east: float, north: float) -> List[dict]:
+    """
+    Return the sighting clusters of every tile intersecting a (west, south, east, north) rectangle at the given
+    zoom level. Each cluster is a dict with the centroid latitude/longitude, the number of sightings and the id of a
+    representative sighting. Clusters are cached per tile and zoom level until Sightings or Locations change.
+    """
+    tiles = tiles_for_bounds(zoom, west, south, east, north)
+    if len(tiles) > MAX_CLUSTER_TILES:
+        raise SightingInputValidationException(
+            f'Bounds span {len(tiles)} tiles at zoom {zoom}, the maximum is {MAX_CLUSTER_TILES}'
+        )
+
+    prefix = versioned_key('sighting-clusters', (Sighting, Location), zoom)
+    keys = {tile: f'{prefix}:{tile[0]}:{tile[1]}' for tile in tiles}
+    cached = cache.get_many(keys.values())
+
+    missing = [tile for tile in tiles if keys[tile] not in cached]
+    if missing:
+        computed = _aggregate_tiles(zoom, missing)
+        cache.set_many({keys[tile]: computed[tile] for tile in missing}, CLUSTER_CACHE_TIMEOUT)
+        cached.update({keys[tile]: computed[tile] for tile in missing})
+
+    return [cluster for tile in tiles for cluster in cached[keys[tile]]]
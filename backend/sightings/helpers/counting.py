@@ -0,0 +1,103 @@
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import QuerySet
+from sightings.models import Location, Post, Sighting
+from sightings.gql.types.counting import CountMode
+from sightings.helpers.cache import versioned_key
+from sightings.helpers.metrics import count_cache_lookup
+
+
+COUNT_CACHE_TIMEOUT = 60 * 60  # seconds
+
+# models whose writes can change the count of a queryset over each model, filters included
+COUNT_DEPENDENCIES = {
+    Location: (Location,),
+    Sighting: (Sighting, Location),
+    Post: (Post,),
+}
+
+
+def count_cache_key(queryset: QuerySet) -> str:
+    """
+    Cache key of the count of a queryset. The compiled SQL is the normalized form of the filter, and the key embeds
+    the version counters of every model the count depends on.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+    models = COUNT_DEPENDENCIES.get(queryset.model, (queryset.model,))
+    return versioned_key('connection-count', models, queryset.model._meta.label_lower, digest)
+
+
+def cached_count(queryset: QuerySet) -> int:
+    """
+    Count a queryset, reusing the count of an identical query until one of the models it depends on is written to
+    """
+    try:
+        key = count_cache_key(queryset)
+    except EmptyResultSet:
+        # the filter can never match, e.g. an empty OR, and Django would not query the database
+        return 0
+
+    count = cache.get(key)
+    count_cache_lookup('connection_counts', count is not None)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+
+    return count
+
+
+def _table_estimate(queryset: QuerySet) -> int:
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+
+    # reltuples is -1 (0 before Postgres 14) for tables that were never vacuumed or analyzed
+    return int(row[0]) if row and row[0] > 0 else -1
+
+
+def _planner_estimate(queryset: QuerySet) -> int:
+    try:
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset: QuerySet) -> int:
+    """
+    Estimate the count of a queryset from Postgres statistics: pg_class.reltuples for unfiltered querysets, the
+    planner's row estimate otherwise. Falls back to cached_count on other databases or before the table has been
+    analyzed.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return cached_count(queryset)
+
+    if not queryset.query.has_filters():
+        estimate = _table_estimate(queryset)
+        if estimate >= 0:
+            return estimate
+
+    return _planner_estimate(queryset)
+
+
+def count_queryset(queryset: QuerySet, mode: CountMode = CountMode.EXACT) -> int:
+    """
+    Count a queryset according to a CountMode
+    """
+    if mode == CountMode.ESTIMATED:
+        return estimated_count(queryset)
+    if mode == CountMode.CACHED:
+        return cached_count(queryset)
+
+    return queryset.count()
@@ -0,0 +1,22 @@
+from datetime import datetime, time
+from django.utils import timezone
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def time_to_seconds(value: time) -> int:
+    """
+    Return the number of whole seconds from midnight to a time of day
+    """
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def seconds_since_midnight(value: datetime) -> int:
+    """
+    Return the number of whole seconds from midnight to a datetime, in the current time zone
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+
+    return time_to_seconds(value.time())
@@ -0,0 +1,190 @@
+from collections import Counter
+from datetime import date, datetime
+from typing import List, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast, Floor, Greatest, TruncMonth
+from django.utils import timezone
+from sightings.models import Sighting, SightingDensity
+
+
+COLUMNS = int(360 / SightingDensity.CELL_SIZE)
+ROWS = int(180 / SightingDensity.CELL_SIZE)
+
+
+def density_cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    """
+    Return the (cell_x, cell_y) of the density grid cell containing a point
+    """
+    cell_x = int((float(longitude) + 180) // SightingDensity.CELL_SIZE)
+    cell_y = int((float(latitude) + 90) // SightingDensity.CELL_SIZE)
+    return min(max(cell_x, 0), COLUMNS - 1), min(max(cell_y, 0), ROWS - 1)
+
+
+def month_bucket(value) -> date:
+    """
+    Return the first day of the month containing a date or datetime, in the current time zone
+    """
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+
+    return value.replace(day=1)
+
+
+def month_range(start: date, end: date) -> List[date]:
+    """
+    Return the first day of every month from start to end, inclusive
+    """
+    months = []
+    month = month_bucket(start)
+    while month <= end:
+        months.append(month)
+        if month.month == 12:
+            month = month.replace(year=month.year + 1, month=1)
+        else:
+            month = month.replace(month=month.month + 1)
+
+    return months
+
+
+def rebuild_density_cube() -> int:
+    """
+    Recompute the whole density cube from the Sighting table with a single aggregate query.
+    Returns the number of non-empty cells written.
+    """
+    latitude = Cast('location__latitude', FloatField())
+    longitude = Cast('location__longitude', FloatField())
+    rows = (
+        Sighting.objects
+        .annotate(
+            bucket=TruncMonth('sighting_datetime'),
+            cell_x=Floor((longitude + 180.0) / SightingDensity.CELL_SIZE),
+            cell_y=Floor((latitude + 90.0) / SightingDensity.CELL_SIZE),
+        )
+        .values('bucket', 'cell_x', 'cell_y')
+        .annotate(count=Count('id'))
+    )
+
+    cells = {}
+    for row in rows.iterator():
+        # points on the east/north edge of the globe belong to the last cell
+        key = (
+            month_bucket(row['bucket']),
+            min(int(row['cell_x']), COLUMNS - 1),
+            min(int(row['cell_y']), ROWS - 1),
+        )
+        cells[key] = cells.get(key, 0) + row['count']
+
+    with transaction.atomic():
+        SightingDensity.objects.all().delete()
+        SightingDensity.objects.bulk_create(
+            (
+                SightingDensity(month=month, cell_x=cell_x, cell_y=cell_y, count=count)
+                for (month, cell_x, cell_y), count in cells.items()
+            ),
+            batch_size=5000,
+        )
+
+    return len(cells)
+
+
+def adjust_density(latitude: float, longitude: float, sighting_datetime: datetime, delta: int):
+    """
+    Add delta to the count of the cell and month a sighting falls in. Counts never drop below zero, so a cube that
+    missed some inserts (e.g. fixtures loaded without rebuilding it) stays valid.
+    """
+    cell_x, cell_y = density_cell(latitude, longitude)
+    lookup = {'cell_x': cell_x, 'cell_y': cell_y, 'month': month_bucket(sighting_datetime)}
+
+    if SightingDensity.objects.filter(**lookup).update(count=Greatest(F('count') + delta, 0)) or delta < 0:
+        return
+
+    try:
+        with transaction.atomic():
+            SightingDensity.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # created concurrently
+        SightingDensity.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def _location_months(location_id: int) -> Counter:
+    """
+    Return the number of sightings at a location in each month
+    """
+    datetimes = Sighting.objects.filter(location_id=location_id).values_list('sighting_datetime', flat=True)
+    return Counter(month_bucket(value) for value in datetimes.iterator())
+
+
+def move_location_density(location_id: int, previous: Tuple[float, float], current: Tuple[float, float]):
+    """
+    Move the counts of every sighting at a location from the cell of its previous (latitude, longitude) to the cell
+    of its current one
+    """
+    if density_cell(*previous) == density_cell(*current):
+        return
+
+    for month, count in _location_months(location_id).items():
+        adjust_density(*previous, month, delta=-count)
+        adjust_density(*current, month, delta=count)
+
+
+def uncount_location_density(location_id: int, latitude: float, longitude: float):
+    """
+    Remove the counts of every sighting at a location, with one update per month rather than per sighting
+    """
+    for month, count in _location_months(location_id).items():
+        adjust_density(latitude, longitude, month, delta=-count)
+
+
+def density_slice(
+    west: float, south: float, east: float, north: float, start: date, end: date
+) -> dict:
+    """
+    Return the part of the density cube inside a (west, south, east, north) rectangle, from the month of start to
+    the month of end. The slice is a dense [month][row][column] grid flattened into parallel arrays of the indices
+    and counts of its non-empty cells.
+    """
+    x_start, y_start = density_cell(south, west)
+    x_end, y_end = density_cell(north, east)
+    rows = y_end - y_start + 1
+    months = month_range(start, end)
+
+    if west <= east:
+        columns = x_end - x_start + 1
+        column_query = Q(cell_x__gte=x_start, cell_x__lte=x_end)
+    elif x_start == x_end:
+        # wraps all the way around the globe
+        columns = COLUMNS
+        column_query = Q()
+    else:
+        # crosses the antimeridian
+        columns = x_end + COLUMNS - x_start + 1
+        column_query = Q(cell_x__gte=x_start) | Q(cell_x__lte=x_end)
+
+    cells = SightingDensity.objects.filter(
+        column_query,
+        cell_y__gte=y_start,
+        cell_y__lte=y_end,
+        month__gte=month_bucket(start),
+        month__lte=month_bucket(end),
+        count__gt=0,
+    ).values_list('month', 'cell_x', 'cell_y', 'count')
+
+    month_index = {month: i for i, month in enumerate(months)}
+    entries = sorted(
+        ((month_index[month] * rows + cell_y - y_start) * columns + (cell_x - x_start) % COLUMNS, count)
+        for month, cell_x, cell_y, count in cells
+    )
+
+    return {
+        'cell_size': SightingDensity.CELL_SIZE,
+        'west': x_start * SightingDensity.CELL_SIZE - 180,
+        'south': y_start * SightingDensity.CELL_SIZE - 90,
+        'columns': columns,
+        'rows': rows,
+        'months': months,
+        'indices': [index for index, _ in entries],
+        'counts': [count for _, count in entries],
+    }
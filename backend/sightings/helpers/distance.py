@@ -0,0 +1,130 @@
+import math
+from typing import List, Tuple
+from django.db.models import BooleanField, FloatField, Func, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+from geopy import distance
+
+
+# mean earth radius (IUGG), in meters
+EARTH_MEAN_RADIUS = 6371008.8
+
+# the great-circle distance on the mean-radius sphere never deviates from the WGS-84 geodesic distance by more
+# than ~0.5%. Distance filters re-check the rows whose spherical distance falls inside this band around arc_length
+# with the geodesic distance, and nearest neighbour searches on the sphere are widened by this much before ranking
+# by geodesic distance.
+GEODESIC_TOLERANCE = 0.006
+
+# absolute slack, in meters, added to the band so very small distances are always covered
+GEODESIC_SLACK = 1.0
+
+
+def geodesic_distance(latitude_a: float, longitude_a: float, latitude_b: float, longitude_b: float) -> float:
+    """
+    Return the WGS-84 geodesic distance, in meters, between two points
+    """
+    return distance.distance((latitude_a, longitude_a), (latitude_b, longitude_b)).meters
+
+
+def circle_area(arc_length: float) -> float:
+    """
+    Return the area, in square meters, of the spherical cap within arc_length meters of a point
+    """
+    angle = min(arc_length / EARTH_MEAN_RADIUS, math.pi)
+    return 2 * math.pi * EARTH_MEAN_RADIUS ** 2 * (1 - math.cos(angle))
+
+
+def bounds_area(west: float, south: float, east: float, north: float) -> float:
+    """
+    Return the area, in square meters, of a latitude/longitude rectangle. A rectangle whose west edge lies east of
+    its east edge crosses the antimeridian.
+    """
+    width = east - west if west <= east else 360 - west + east
+    height = math.sin(math.radians(north)) - math.sin(math.radians(south))
+    return EARTH_MEAN_RADIUS ** 2 * math.radians(width) * height
+
+
+def geodesic_band(arc_length: float) -> Tuple[float, float]:
+    """
+    Return the (lower, upper) spherical distances between which a point may lie on either side of arc_length meters
+    geodesic. Points closer than lower on the sphere are within arc_length, points farther than upper are not.
+    """
+    band = arc_length * GEODESIC_TOLERANCE + GEODESIC_SLACK
+    return arc_length - band, arc_length + band
+
+
+# smallest radius of curvature of the WGS-84 ellipsoid (meridional, at the equator), in meters. Dividing an arc by
+# this radius never underestimates the angle it spans, which keeps bounding boxes conservative.
+EARTH_MIN_RADIUS_OF_CURVATURE = 6335439.0
+
+
+def bounding_boxes(
+    latitude: float, longitude: float, arc_length: float
+) -> List[Tuple[float, float, float, float]]:
+    """
+    Return the latitude/longitude boxes, as (south, west, north, east) tuples, that contain every point within
+    arc_length meters of (latitude, longitude). Boxes that cross the antimeridian are split in two, and boxes that
+    reach a pole span every longitude. An empty list means the circle covers the whole globe.
+    :param latitude: central latitude
+    :param longitude: central longitude
+    :param arc_length: distance, in meters, from the central location
+    """
+    delta = arc_length / EARTH_MIN_RADIUS_OF_CURVATURE
+    if delta >= math.pi:
+        return []
+
+    lat = math.radians(latitude)
+    south = math.degrees(lat - delta)
+    north = math.degrees(lat + delta)
+
+    if south <= -90 or north >= 90:
+        # the circle contains a pole
+        return [(max(south, -90.0), -180.0, min(north, 90.0), 180.0)]
+
+    ratio = math.sin(delta) / math.cos(lat)
+    if ratio >= 1:
+        return [(south, -180.0, north, 180.0)]
+
+    delta_lon = math.degrees(math.asin(ratio))
+    west = longitude - delta_lon
+    east = longitude + delta_lon
+
+    if west < -180:
+        return [(south, west + 360, north, 180.0), (south, -180.0, north, east)]
+    if east > 180:
+        return [(south, west, north, 180.0), (south, -180.0, north, east - 360)]
+
+    return [(south, west, north, east)]
+
+
+def great_circle_distance(latitude: float, longitude: float, prefix: str = '') -> Func:
+    """
+    Build a SQL expression computing the haversine distance, in meters, between each row's latitude/longitude
+    columns and (latitude, longitude). Only portable math functions are used, which Django also provides on SQLite.
+    :param latitude: central latitude
+    :param longitude: central longitude
+    :param prefix: lookup prefix of the latitude/longitude columns, e.g. 'location__' when querying Sightings
+    """
+    lat = Radians(Cast(f'{prefix}latitude', FloatField()))
+    lon = Radians(Cast(f'{prefix}longitude', FloatField()))
+    lat0 = math.radians(latitude)
+    lon0 = math.radians(longitude)
+
+    a = (
+        Power(Sin((lat - Value(lat0)) / Value(2.0)), Value(2.0)) +
+        Value(math.cos(lat0)) * Cos(lat) * Power(Sin((lon - Value(lon0)) / Value(2.0)), Value(2.0))
+    )
+    return Value(2 * EARTH_MEAN_RADIUS) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+class WithinDistance(Func):
+    """
+    Boolean SQL expression, true for rows whose great-circle distance from (latitude, longitude) is at most
+    arc_length meters. Can be used directly inside Q objects.
+    """
+    conditional = True
+    output_field = BooleanField()
+    template = '(%(expressions)s)'
+    arg_joiner = ' <= '
+
+    def __init__(self, latitude: float, longitude: float, arc_length: float, prefix: str = ''):
+        super().__init__(great_circle_distance(latitude, longitude, prefix), Value(float(arc_length)))
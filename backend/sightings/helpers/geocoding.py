@@ -1,12 +1,22 @@
-from typing import Optional
-from django.db.models import Q
+import time
+from typing import List, Optional, Tuple
+from django.db.models import ExpressionWrapper, FloatField, Q
 from django.db.models.query import QuerySet
 from django.conf import settings
 from geopy.geocoders import (
     get_geocoder_for_service,
     GeocoderNotFound,
 )
-from geopy import distance
+from sightings.helpers import geohash
+from sightings.helpers.metrics import GEOCODER_DURATION, GEOCODER_ERRORS
+from sightings.helpers.distance import (
+    WithinDistance,
+    bounding_boxes,
+    geodesic_band,
+    geodesic_distance,
+    great_circle_distance,
+)
+from sightings.helpers.spatial_index import get_location_index
 from sightings.exceptions import LocationInputValidationException
 from sightings.models import (
     Location,
@@ -89,6 +99,18 @@ def validate_longitude_latitude(longitude: float, latitude: float) -> bool:
     return abs(longitude) <= 180 and abs(latitude) <= 90
 
 
+def validate_bounds(west: float, south: float, east: float, north: float) -> bool:
+    """
+    Verify that a (west, south, east, north) rectangle is valid. west may be greater than east, for rectangles
+    crossing the antimeridian.
+    """
+    return (
+        validate_longitude_latitude(longitude=west, latitude=south) and
+        validate_longitude_latitude(longitude=east, latitude=north) and
+        south <= north
+    )
+
+
 def evaluate_query(
     services: list, query: str, city: str = None, country: str = None, state: str = None
 ) -> bool:
@@ -107,7 +129,14 @@ def evaluate_query(
             config = generate_geocoder_config_for_service(service)
 
             geolocator = cls(**config)
-            location = geolocator.reverse(query, language='en', zoom=10)
+            start = time.perf_counter()
+            try:
+                location = geolocator.reverse(query, language='en', zoom=10)
+            except Exception as e:
+                GEOCODER_ERRORS.inc(service=service, error=type(e).__name__)
+                raise
+            finally:
+                GEOCODER_DURATION.observe(time.perf_counter() - start, service=service)
 
             address = location.raw.get('address')
             city_or_town = address.get('city') if 'city' in address else address.get('town', "")
@@ -166,20 +195,89 @@ def generate_lat_lon_nearby_query(latitude: float, longitude: float, precision:
     )
 
 
-def find_closest_location(locations: QuerySet, latitude: float, longitude: float):
+def generate_lat_lon_bounding_box_query(latitude: float, longitude: float, arc_length: float, prefix: str = ''):
+    """
+    Generate a latitude/longitude range query matching a superset of the locations within arc_length meters of a
+    point. Returns an empty Q object when the circle covers the whole globe.
+    """
+    query = Q()
+    for south, west, north, east in bounding_boxes(latitude, longitude, arc_length):
+        query |= generate_lat_lon_box_query(south, west, north, east, prefix=prefix)
+
+    return query
+
+
+def generate_lat_lon_bounds_query(west: float, south: float, east: float, north: float, prefix: str = ''):
     """
-    Find location in locations that is closest in distance to latitude and longitude, and within
-    the LOCATION_DISTANCE_THRESHOLD
+    Generate a range query matching the locations inside a (west, south, east, north) rectangle. A rectangle whose
+    west edge lies east of its east edge crosses the antimeridian and is split in two.
     """
-    diff = float('inf')
-    nearest = None
-    for location in locations:
-        dist = distance.distance((location.latitude, location.longitude), (latitude, longitude)).meters
-        if dist <= settings.LOCATION_DISTANCE_THRESHOLD and dist < diff:
-            diff = dist
-            nearest = location
+    if west <= east:
+        return generate_lat_lon_box_query(south, west, north, east, prefix=prefix)
 
-    return nearest
+    return (
+        generate_lat_lon_box_query(south, west, north, 180.0, prefix=prefix) |
+        generate_lat_lon_box_query(south, -180.0, north, east, prefix=prefix)
+    )
+
+
+def generate_lat_lon_box_query(south: float, west: float, north: float, east: float, prefix: str = ''):
+    """
+    Generate an indexable range query for a box that does not cross the antimeridian, narrowed by a geohash prefix
+    cover when the box is small enough
+    """
+    box = Q(**{f'{prefix}latitude__gte': south, f'{prefix}latitude__lte': north})
+    if west > -180 or east < 180:
+        box &= Q(**{f'{prefix}longitude__gte': west, f'{prefix}longitude__lte': east})
+
+    return generate_geohash_cover_query(south, west, north, east, prefix=prefix) & box
+
+
+def generate_geohash_cover_query(south: float, west: float, north: float, east: float, prefix: str = ''):
+    """
+    Generate an indexed geohash prefix query matching a superset of the locations inside a box that does not cross
+    the antimeridian. Returns an empty Q object when the box is too large to be covered by a few cells.
+    """
+    query = Q()
+    for cell in geohash.covering_cells(south, west, north, east):
+        query |= Q(**{f'{prefix}geohash__startswith': cell})
+
+    return query
+
+
+def find_closest_location(latitude: float, longitude: float, locations: QuerySet) -> Optional[Location]:
+    """
+    Find the location among a (small) queryset of candidate locations that is closest in distance to latitude and
+    longitude, and within the LOCATION_DISTANCE_THRESHOLD
+    """
+    nearest = sorted(
+        (geodesic_distance(float(lat), float(lon), latitude, longitude), pk)
+        for pk, lat, lon in locations.values_list('id', 'latitude', 'longitude')
+    )
+
+    nearest = [pk for dist, pk in nearest if dist <= settings.LOCATION_DISTANCE_THRESHOLD]
+    if not nearest:
+        return None
+
+    return Location.objects.filter(pk=nearest[0]).first()
+
+
+def find_nearest_locations(latitude: float, longitude: float, k: int) -> List[Tuple[float, Location]]:
+    """
+    Return up to k (distance in meters, Location) pairs nearest to latitude and longitude, nearest first
+    """
+    if not validate_longitude_latitude(longitude=longitude, latitude=latitude):
+        raise LocationInputValidationException(f'Invalid latitude, longitude: ({latitude}, {longitude})')
+    if not 0 < k <= settings.MAX_NEAREST_LOCATIONS:
+        raise LocationInputValidationException(
+            f'k must be between 1 and {settings.MAX_NEAREST_LOCATIONS}, got {k}'
+        )
+
+    nearest = get_location_index().nearest(latitude, longitude, k)
+    locations = Location.objects.in_bulk([pk for _, pk in nearest])
+
+    # the index can briefly hold locations deleted by another worker process
+    return [(dist, locations[pk]) for dist, pk in nearest if pk in locations]
 
 
 def map_state_abr_to_name(state_abr: str):
@@ -201,9 +299,9 @@ def create_and_validate_location(
     Otherwise, return new Location.
     :return:
     """
-    query = generate_lat_lon_nearby_query(latitude, longitude, 0.001)  # 0.001 is an arbitrary precision value
-    locations = Location.objects.filter(query)
-    nl = find_closest_location(locations, latitude, longitude)
+    # the database is authoritative for duplicates, so look them up through the indexed geohash column
+    query = generate_lat_lon_bounding_box_query(latitude, longitude, settings.LOCATION_DISTANCE_THRESHOLD)
+    nl = find_closest_location(latitude, longitude, locations=Location.objects.filter(query))
 
     if nl is None:
         state_name = map_state_abr_to_name(state.upper()) if state else None
@@ -221,15 +319,34 @@ def create_and_validate_location(
 
 
 def locations_distance_within_q(
-    locations: QuerySet, latitude: float, longitude: float, arc_length: float
+    latitude: float, longitude: float, arc_length: float, prefix: str = ''
 ):
-    ids = []
-    for location in locations:
-        dist = distance.distance((location.latitude, location.longitude), (latitude, longitude)).meters
-        if dist <= arc_length:
-            ids.append(location.id)
+    """
+    Return a Q object matching rows within a given geodesic distance in meters from a point. Distances are computed
+    by the database on the sphere; the few locations whose spherical distance is too close to arc_length to decide
+    are fetched and re-checked with the geodesic distance. The bounding box of the circle is included as a range
+    predicate so the database can narrow the candidates with an index first.
+    :param prefix: lookup prefix of the latitude/longitude columns, e.g. 'location__' when querying Sightings
+    """
+    lower, upper = geodesic_band(arc_length)
+    band = (
+        Location.objects
+        .filter(generate_lat_lon_bounding_box_query(latitude, longitude, arc_length))
+        .annotate(distance=ExpressionWrapper(great_circle_distance(latitude, longitude), output_field=FloatField()))
+        .filter(distance__gt=lower, distance__lte=upper)
+        .values_list('id', 'latitude', 'longitude')
+    )
+    inside = [
+        pk for pk, lat, lon in band.iterator()
+        if geodesic_distance(float(lat), float(lon), latitude, longitude) <= arc_length
+    ]
 
-    return Q(id__in=ids)
+    query = Q(WithinDistance(latitude, longitude, lower, prefix=prefix))
+    if inside:
+        query |= Q(**{f'{prefix}id__in': inside})
+
+    bbox = generate_lat_lon_bounding_box_query(latitude, longitude, arc_length, prefix=prefix)
+    return bbox & query
 
 
 def find_locations_by_distance_within(
@@ -244,21 +361,19 @@ def find_locations_by_distance_within(
     :return:
     """
     query = locations_distance_within_q(
-        locations, latitude, longitude, arc_length
+        latitude, longitude, arc_length
     )
     return locations.filter(query)
 
 
 def locations_distance_outside_q(
-    locations: QuerySet, latitude: float, longitude: float, arc_length: float
+    latitude: float, longitude: float, arc_length: float, prefix: str = ''
 ):
-    ids = []
-    for location in locations:
-        dist = distance.distance((location.latitude, location.longitude), (latitude, longitude)).meters
-        if dist > arc_length:
-            ids.append(location.id)
-
-    return Q(id__in=ids)
+    """
+    Return a Q object matching rows outside a given distance in meters from a point
+    :param prefix: lookup prefix of the latitude/longitude columns, e.g. 'location__' when querying Sightings
+    """
+    return ~locations_distance_within_q(latitude, longitude, arc_length, prefix=prefix)
 
 
 def find_locations_by_distance_outside(
@@ -272,8 +387,8 @@ def find_locations_by_distance_outside(
     :param arc_length: distance in meters
     :return:
     """
-    query = locations_distance_within_q(
-        locations, latitude, longitude, arc_length,
+    query = locations_distance_outside_q(
+        latitude, longitude, arc_length,
     )
     return locations.filter(query)
 
@@ -289,15 +404,10 @@ def find_sightings_by_distance_within(
     :param arc_length: distance in meters
     :return:
     """
-    ids = []
-    for sighting in sightings:
-        dist = distance.distance(
-            (sighting.location.latitude, sighting.location.longitude), (latitude, longitude)
-        ).meters
-        if dist <= arc_length:
-            ids.append(sighting.id)
-
-    return Sighting.objects.all().filter(id__in=ids)
+    query = locations_distance_within_q(
+        latitude, longitude, arc_length, prefix='location__'
+    )
+    return sightings.filter(query)
 
 
 def find_sightings_by_distance_outside(
@@ -310,12 +420,7 @@ def find_sightings_by_distance_outside(
     :param longitude:
     :param arc_length: distance in meters
     """
-    ids = []
-    for sighting in sightings:
-        dist = distance.distance(
-            (sighting.location.latitude, sighting.location.longitude), (latitude, longitude)
-        ).meters
-        if dist > arc_length:
-            ids.append(sighting.id)
-
-    return Sighting.objects.all().filter(id__in=ids)
+    query = locations_distance_outside_q(
+        latitude, longitude, arc_length, prefix='location__'
+    )
+    return sightings.filter(query)
@@ -0,0 +1,80 @@
+import math
+from typing import List, Tuple
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# number of characters stored in Location.geohash (cells of a few centimeters)
+GEOHASH_PRECISION = 12
+
+# upper bound on the number of prefixes a covering query may OR together
+MAX_COVERING_CELLS = 16
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """
+    Encode a (latitude, longitude) pair as a geohash string of the given precision
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coordinate >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    Return the (height, width), in degrees, of a geohash cell of the given precision
+    """
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = math.floor(5 * precision / 2)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(
+    south: float, west: float, north: float, east: float, max_cells: int = MAX_COVERING_CELLS
+) -> List[str]:
+    """
+    Return the geohash prefixes, at the finest precision needing no more than max_cells of them, whose cells
+    together cover the (south, west, north, east) box. The box must not cross the antimeridian. Returns an empty
+    list when even single-character cells would exceed max_cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        last_row = int(180 / height) - 1
+        last_col = int(360 / width) - 1
+        row_start = min(int((south + 90) // height), last_row)
+        row_end = min(int((north + 90) // height), last_row)
+        col_start = min(int((west + 180) // width), last_col)
+        col_end = min(int((east + 180) // width), last_col)
+
+        if (row_end - row_start + 1) * (col_end - col_start + 1) > max_cells:
+            continue
+
+        return [
+            encode((row + 0.5) * height - 90, (col + 0.5) * width - 180, precision)
+            for row in range(row_start, row_end + 1)
+            for col in range(col_start, col_end + 1)
+        ]
+
+    return []
@@ -0,0 +1,221 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+from django.db.models import BooleanField, F, Field, Func, Q, QuerySet, Value
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import OrderBy
+from strawberry_django_plus.relay import from_base64, to_base64
+from sightings.filters.boolean import MATCH_NONE
+
+
+KEYSET_CURSOR_PREFIX = 'keyset'
+
+# prefix of the annotations holding each row's sort key values
+KEYSET_ANNOTATION = 'keyset_'
+
+
+class Row(Func):
+    """
+    SQL row value constructor, (a, b, ...)
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ', '
+
+
+class RowComparison(Func):
+    """
+    Comparison of two row values, (a, b) > (x, y), which databases serve as a single index seek
+    """
+    conditional = True
+    output_field = BooleanField()
+    template = '%(expressions)s'
+
+    def __init__(self, lhs: Sequence, operator: str, rhs: Sequence):
+        self.arg_joiner = f' {operator} '
+        super().__init__(Row(*lhs, output_field=Field()), Row(*rhs, output_field=Field()))
+
+
+class SortKey:
+    """
+    One column of a keyset ordering
+    """
+    def __init__(self, name: str, descending: bool, field: Field):
+        self.name = name
+        self.descending = descending
+        self.field = field
+
+    @property
+    def nullable(self) -> bool:
+        return getattr(self.field, 'null', False)
+
+    def order_by(self) -> OrderBy:
+        # nulls sort as if larger than every value, on every database: last ascending and first descending. This is
+        # the order of a Postgres btree index, so both directions are served by scanning the same ascending index.
+        nulls_first = self.nullable and self.descending
+        nulls_last = self.nullable and not self.descending
+        return OrderBy(F(self.name), descending=self.descending, nulls_first=nulls_first, nulls_last=nulls_last)
+
+    def value(self, value: Any) -> Value:
+        return Value(value, output_field=self.field)
+
+
+def _model_field(queryset: QuerySet, name: str) -> Field:
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+
+    model = queryset.model
+    parts = name.split(LOOKUP_SEP)
+    for part in parts[:-1]:
+        model = model._meta.get_field(part).related_model
+    field = model._meta.get_field(parts[-1])
+    if field.is_relation:
+        raise ValueError(f'Cannot paginate by relation {name}')
+
+    return field
+
+
+def sort_keys(queryset: QuerySet) -> List[SortKey]:
+    """
+    Return the ordering of a queryset as a list of SortKeys, ending with the primary key as a unique tiebreaker
+    """
+    ordering = queryset.query.order_by or (queryset.query.default_ordering and queryset.model._meta.ordering) or ()
+    pk_name = queryset.model._meta.pk.name
+
+    keys = []
+    for item in ordering:
+        if isinstance(item, str):
+            descending, name = item.startswith('-'), item.lstrip('-')
+        elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+            descending, name = item.descending, item.expression.name
+        else:
+            raise ValueError(f'Cannot paginate by {item}')
+
+        name = pk_name if name == 'pk' else name
+        keys.append(SortKey(name, descending, _model_field(queryset, name)))
+        if name == pk_name:
+            return keys
+
+    keys.append(SortKey(pk_name, keys[-1].descending if keys else False, queryset.model._meta.pk))
+    return keys
+
+
+def _json_default(value):
+    # keeps full precision, unlike DjangoJSONEncoder which truncates microseconds
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Cannot encode {value!r} in a cursor')
+
+
+def encode_cursor(values: Sequence) -> str:
+    return to_base64(KEYSET_CURSOR_PREFIX, json.dumps(list(values), default=_json_default))
+
+
+def decode_cursor(cursor: str, keys: List[SortKey]) -> list:
+    try:
+        prefix, payload = from_base64(cursor)
+        values = json.loads(payload)
+    except (ValueError, TypeError):
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+    if prefix != KEYSET_CURSOR_PREFIX or not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+    return [None if v is None else key.field.to_python(v) for key, v in zip(keys, values)]
+
+
+def _strictly(key: SortKey, value: Any, after: bool) -> Q:
+    """
+    Q object matching rows strictly after (or before) value on a single key, with nulls larger than every value
+    """
+    larger = key.descending != after
+    if value is None:
+        return MATCH_NONE if larger else Q(**{f'{key.name}__isnull': False})
+
+    query = Q(**{f'{key.name}__{"gt" if larger else "lt"}': value})
+    if larger and key.nullable:
+        query |= Q(**{f'{key.name}__isnull': True})
+
+    return query
+
+
+def _equal(key: SortKey, value: Any) -> Q:
+    if value is None:
+        return Q(**{f'{key.name}__isnull': True})
+
+    return Q(**{key.name: value})
+
+
+def seek_q(keys: List[SortKey], values: list, after: bool) -> Q:
+    """
+    Q object matching rows strictly after (or before) the row with the given sort key values. When every key has
+    the same direction and no nulls are involved, this is a single row value comparison, (key, id) > (x, y).
+    """
+    directions = {key.descending for key in keys}
+    if len(directions) == 1 and not any(key.nullable for key in keys) and None not in values:
+        operator = '<' if directions.pop() == after else '>'
+        return Q(RowComparison(
+            [F(key.name) for key in keys], operator, [key.value(v) for key, v in zip(keys, values)]
+        ))
+
+    query = MATCH_NONE
+    prefix = Q()
+    for key, value in zip(keys, values):
+        query |= prefix & _strictly(key, value, after)
+        prefix &= _equal(key, value)
+
+    return query
+
+
+def keyset_page(
+    queryset: QuerySet,
+    *,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    first: Optional[int] = None,
+    last: Optional[int] = None,
+    max_results: int,
+) -> Tuple[list, List[str], bool, bool]:
+    """
+    Fetch one page of a queryset by seeking past its sort keys instead of using OFFSET.
+    Returns (rows, cursors, has_previous_page, has_next_page).
+    """
+    for name, value in (('first', first), ('last', last)):
+        if value is not None and not 0 <= value <= max_results:
+            raise ValueError(f"Argument '{name}' must be between 0 and {max_results}.")
+
+    keys = sort_keys(queryset)
+    queryset = queryset.annotate(**{f'{KEYSET_ANNOTATION}{i}': F(key.name) for i, key in enumerate(keys)})
+    if after:
+        queryset = queryset.filter(seek_q(keys, decode_cursor(after, keys), after=True))
+    if before:
+        queryset = queryset.filter(seek_q(keys, decode_cursor(before, keys), after=False))
+
+    backwards = first is None and last is not None
+    limit = last if backwards else (first if first is not None else max_results)
+    ordering = [key.order_by() for key in keys]
+    if backwards:
+        ordering = [o.copy() for o in ordering]
+        for o in ordering:
+            o.reverse_ordering()
+
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if backwards:
+        rows.reverse()
+        has_previous_page, has_next_page = has_more, bool(before)
+    else:
+        has_previous_page, has_next_page = bool(after), has_more
+        if last is not None and len(rows) > last:
+            rows = rows[len(rows) - last:]
+            has_previous_page = True
+
+    cursors = [
+        encode_cursor(getattr(row, f'{KEYSET_ANNOTATION}{i}') for i in range(len(keys)))
+        for row in rows
+    ]
+    return rows, cursors, has_previous_page, has_next_page
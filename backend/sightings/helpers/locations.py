@@ -5,26 +5,29 @@ from sightings.gql.types.location import (
     LocationType,
     LocationNode,
 )
+from sightings.helpers.search import search_q
 from sightings.helpers.geocoding import (
     verify_location_coordinates,
     create_and_validate_location,
 )
 
 
+# Case-insensitive exact matches compare LOWER(field) so that they can use the functional indexes on Location;
+# __iexact compiles to UPPER() on Postgres and LIKE on SQLite, neither of which is indexed.
 def locations_q_by_state_exact(state_exact: str):
-    return Q(state__iexact=state_exact) if state_exact else Q()
+    return Q(state__lower=state_exact.lower()) if state_exact else Q()
 
 
 def locations_q_by_state_name_exact(state_name_exact: str):
-    return Q(state_name__iexact=state_name_exact) if state_name_exact else Q()
+    return Q(state_name__lower=state_name_exact.lower()) if state_name_exact else Q()
 
 
 def locations_q_by_city_exact(city_exact: str):
-    return Q(city__iexact=city_exact) if city_exact else Q()
+    return Q(city__lower=city_exact.lower()) if city_exact else Q()
 
 
 def locations_q_by_country_exact(country_exact: str):
-    return Q(country__iexact=country_exact) if country_exact else Q()
+    return Q(country__lower=country_exact.lower()) if country_exact else Q()
 
 
 def locations_q_by_state_contains(state_contains: str):
@@ -54,17 +57,13 @@ def contains_query(q: str):
 
 def locations_q_by_search_query(q: str):
     """
-    Split up query string and turn each into a separate Q() object to be combined
-    into a single "&" query.
+    Split up query string and turn each term into a separate Q() object, matching locations with any of city, state,
+    state_name or country containing the term, to be combined into a single "&" query. Terms are served by trigram
+    indexes on Postgres and by the in-process search index elsewhere, see sightings.helpers.search.
     :param q: query string, space separated
     :return: django Q object
     """
-    query_terms = list(map(contains_query, q.split(' ')))
-    query = Q()
-    for term in query_terms:
-        query &= term
-
-    return query
+    return search_q(q)
 
 
 def create_location(location_input: dict) -> Optional[LocationType]:
@@ -85,7 +84,8 @@ def create_location(location_input: dict) -> Optional[LocationType]:
 
     if verify_location_coordinates(**location_input):
         location = create_and_validate_location(**location_input)
-        location.save()
+        if location.pk is None:
+            location.save()
         return LocationType(
             id=to_base64(LocationNode.__name__, location.pk),
             latitude=location.latitude,
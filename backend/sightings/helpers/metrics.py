@@ -0,0 +1,328 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+Labels = Tuple[Tuple[str, str], ...]
+SampleKey = Tuple[str, str, Labels]
+
+# seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# samples of exited worker processes, and the lock guarding it, in METRICS_DIR
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = 'metrics.lock'
+
+
+def _read_samples(path: str) -> Dict[SampleKey, float]:
+    try:
+        with open(path) as f:
+            samples = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    return {(name, suffix, tuple(tuple(label) for label in labels)): value for name, suffix, labels, value in samples}
+
+
+def _write_samples(path: str, samples: Dict[SampleKey, float]):
+    # write to a temporary file first so concurrent readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump([[name, suffix, list(labels), value] for (name, suffix, labels), value in samples.items()], f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _add_samples(totals: Dict[SampleKey, float], samples: Dict[SampleKey, float]):
+    for key, value in samples.items():
+        totals[key] = totals.get(key, 0.0) + value
+
+
+@contextmanager
+def _locked(directory: str, exclusive: bool):
+    """
+    Hold the lock file of METRICS_DIR. Without fcntl (on Windows) nothing is locked, and a scrape racing the
+    replacement of a worker process can count the samples of the exited process twice.
+    """
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class Registry:
+    """
+    Process-local store of metric samples. Every sample is a sum (counter values, histogram bucket counts, sums
+    and counts), so the samples of several worker processes aggregate by addition: each process periodically
+    writes its samples to its own file in METRICS_DIR, and collect() adds up the files of every process. Before its
+    first write, a process folds the files of exited processes, including one left under its own reused pid, into
+    the archive file, so that totals never go backwards when workers are replaced, and arranges to write its samples
+    a last time when it exits. Processes that never flush, such as management commands, leave no file behind.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, 'Metric'] = {}
+        self._samples: Dict[SampleKey, float] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+        self._archived_pid: Optional[int] = None
+
+    def register(self, metric: 'Metric'):
+        self._metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """
+        Register a function called before every flush, to set samples read from elsewhere, e.g. lru_cache stats
+        """
+        self._collectors.append(collector)
+
+    def _check_fork(self):
+        # samples inherited from the parent process are its own, the child starts from zero
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._samples = {}
+            self._flushed_at = 0.0
+
+    def add(self, key: SampleKey, amount: float):
+        with self._lock:
+            self._check_fork()
+            self._samples[key] = self._samples.get(key, 0.0) + amount
+
+    def set(self, key: SampleKey, value: float):
+        with self._lock:
+            self._check_fork()
+            self._samples[key] = value
+
+    def _path(self) -> Optional[str]:
+        directory = settings.METRICS_DIR
+        return os.path.join(directory, f'{self._pid}.json') if directory else None
+
+    def flush(self):
+        """
+        Write the samples of this process to its file in METRICS_DIR
+        """
+        for collector in self._collectors:
+            collector()
+
+        with self._lock:
+            self._check_fork()
+            samples = dict(self._samples)
+            self._flushed_at = time.monotonic()
+            path = self._path()
+            pid = self._pid
+
+        if path is None:
+            return
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        if self._archived_pid != pid:
+            self._archive_exited(directory, pid)
+            if self._archived_pid is None:
+                atexit.register(self.flush)
+            self._archived_pid = pid
+
+        _write_samples(path, samples)
+
+    @staticmethod
+    def _archive_exited(directory: str, pid: int):
+        with _locked(directory, exclusive=True):
+            archive = os.path.join(directory, ARCHIVE_FILE)
+            totals = _read_samples(archive)
+            exited = []
+            for path in glob.glob(os.path.join(directory, '[0-9]*.json')):
+                owner = int(os.path.basename(path)[:-len('.json')])
+                if owner == pid or not _process_exists(owner):
+                    _add_samples(totals, _read_samples(path))
+                    exited.append(path)
+
+            if exited:
+                _write_samples(archive, totals)
+                for path in exited:
+                    os.unlink(path)
+
+    def flush_if_due(self):
+        if time.monotonic() - self._flushed_at > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def collect(self) -> Dict[SampleKey, float]:
+        """
+        Return the samples of every process, added up
+        """
+        self.flush()
+        directory = settings.METRICS_DIR
+        if not directory:
+            with self._lock:
+                return dict(self._samples)
+
+        totals: Dict[SampleKey, float] = {}
+        # shared with archiving, which would otherwise be seen half done, with exited samples counted twice
+        with _locked(directory, exclusive=False):
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                _add_samples(totals, _read_samples(path))
+
+        return totals
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        """
+        samples = self.collect()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            metric_samples = [item for item in samples.items() if item[0][0] == metric.name]
+            for (name, suffix, labels), value in sorted(metric_samples, key=metric.sort_key):
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry: Registry = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def _labels(self, labels: Dict[str, object]) -> Labels:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    @staticmethod
+    def sort_key(item):
+        (name, suffix, labels), _ = item
+        return name, labels, suffix
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry.add((self.name, '', self._labels(labels)), amount)
+
+    def set_total(self, value: float, **labels):
+        """
+        Set the total counted by this process, for counts kept elsewhere
+        """
+        self.registry.set((self.name, '', self._labels(labels)), value)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Registry = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._labels(labels)
+        for bound in self.buckets:
+            # buckets are cumulative, and every bucket is exported even when empty
+            le = '+Inf' if bound == float('inf') else _format_value(bound)
+            self.registry.add((self.name, '_bucket', key + (('le', le),)), 1 if value <= bound else 0)
+        self.registry.add((self.name, '_sum', key), value)
+        self.registry.add((self.name, '_count', key), 1)
+
+    def sort_key(self, item):
+        (name, suffix, labels), _ = item
+        if suffix != '_bucket':
+            return name, labels, suffix, 0.0
+        le = dict(labels)['le']
+        return name, labels[:-1], suffix, float('inf') if le == '+Inf' else float(le)
+
+
+REGISTRY = Registry()
+
+
+def get_registry() -> Registry:
+    """
+    Return the process-wide metrics registry
+    """
+    return REGISTRY
+
+
+GRAPHQL_OPERATION_DURATION = Histogram(
+    'ufo_graphql_operation_duration_seconds', 'GraphQL request latency, by operation name', ('operation',)
+)
+DB_QUERIES = Histogram(
+    'ufo_db_queries_per_request', 'Database queries run by a request', ('operation',), buckets=QUERY_COUNT_BUCKETS
+)
+DB_DURATION = Histogram(
+    'ufo_db_duration_seconds_per_request', 'Time spent in database queries by a request', ('operation',)
+)
+GEOCODER_DURATION = Histogram(
+    'ufo_geocoder_request_duration_seconds', 'Reverse geocoding request latency, by service', ('service',)
+)
+GEOCODER_ERRORS = Counter(
+    'ufo_geocoder_errors_total', 'Failed reverse geocoding requests, by service and exception', ('service', 'error')
+)
+CACHE_REQUESTS = Counter(
+    'ufo_cache_requests_total', 'Cache lookups, by cache and result (hit or miss)', ('cache', 'result')
+)
+
+
+def count_cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def collect_lru_cache(cache: str, cached_function):
+    """
+    Export the hits and misses of a functools.lru_cache wrapped function as cache lookups
+    """
+    def collect():
+        info = cached_function.cache_info()
+        CACHE_REQUESTS.set_total(info.hits, cache=cache, result='hit')
+        CACHE_REQUESTS.set_total(info.misses, cache=cache, result='miss')
+
+    REGISTRY.add_collector(collect)
@@ -0,0 +1,131 @@
+import glob
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timezone
+from typing import Iterable, Tuple
+from django.conf import settings
+from sightings.models import Location, Sighting
+from sightings.helpers.cache import get_model_version
+from sightings.helpers.geocoding import generate_lat_lon_box_query
+from sightings.helpers.metrics import count_cache_lookup
+from sightings.helpers.tiles import tile_bounds, tile_for_point
+
+
+# Tile payload layout, little-endian:
+#   header     4s magic b'UFOT', uint32 format version, uint32 point count n, uint32 reserved
+#   longitude  float64[n]
+#   latitude   float64[n]
+#   sighting   int64[n]   sighting primary keys
+#   timestamp  int32[n]   sighting time, in seconds since the unix epoch, clamped to the int32 range
+# Every array starts on an 8-byte boundary, so clients can wrap them in typed array views without copying.
+TILE_MAGIC = b'UFOT'
+TILE_FORMAT_VERSION = 1
+TILE_HEADER = struct.Struct('<4sIII')
+
+INT32_MIN = -(2 ** 31)
+INT32_MAX = 2 ** 31 - 1
+
+
+def _timestamp(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return min(max(int(value.timestamp()), INT32_MIN), INT32_MAX)
+
+
+def encode_points(points: Iterable[Tuple[int, float, float, datetime]]) -> bytes:
+    """
+    Pack (sighting id, longitude, latitude, sighting datetime) tuples into the binary tile format
+    """
+    longitudes, latitudes, ids, timestamps = array('d'), array('d'), array('q'), array('i')
+    for pk, longitude, latitude, sighting_datetime in points:
+        ids.append(pk)
+        longitudes.append(float(longitude))
+        latitudes.append(float(latitude))
+        timestamps.append(_timestamp(sighting_datetime))
+
+    if sys.byteorder != 'little':
+        for column in (longitudes, latitudes, ids, timestamps):
+            column.byteswap()
+
+    header = TILE_HEADER.pack(TILE_MAGIC, TILE_FORMAT_VERSION, len(ids), 0)
+    return header + longitudes.tobytes() + latitudes.tobytes() + ids.tobytes() + timestamps.tobytes()
+
+
+def build_tile(zoom: int, x: int, y: int) -> bytes:
+    """
+    Query the sightings inside a tile and encode them
+    """
+    west, south, east, north = tile_bounds(zoom, x, y)
+    rows = (
+        Sighting.objects
+        .filter(generate_lat_lon_box_query(south, west, north, east, prefix='location__'))
+        .order_by('id')
+        .values_list('id', 'location__longitude', 'location__latitude', 'sighting_datetime')
+    )
+
+    # the box is inclusive, keep points lying on a shared edge in exactly one tile
+    return encode_points(
+        row for row in rows.iterator()
+        if tile_for_point(zoom, float(row[2]), float(row[1])) == (x, y)
+    )
+
+
+# models whose writes change the content of a tile
+TILE_DEPENDENCIES = (Sighting, Location)
+
+
+def tile_version() -> str:
+    return '.'.join(str(get_model_version(model)) for model in TILE_DEPENDENCIES)
+
+
+def tile_path(zoom: int, x: int, y: int, version: str) -> str:
+    # the version is part of the name, so a tile built from data read before a write can never be served after it
+    return os.path.join(settings.TILE_CACHE_DIR, str(zoom), str(x), f'{y}.{version}.bin')
+
+
+def get_tile(zoom: int, x: int, y: int) -> Tuple[bytes, int]:
+    """
+    Return the payload of a tile and the modification time of its cached file in nanoseconds, building and writing
+    it to disk first if needed
+    """
+    # read the version before the rows, so that a write committed in between makes this tile stale, not wrong
+    path = tile_path(zoom, x, y, tile_version())
+    try:
+        with open(path, 'rb') as f:
+            payload = f.read()
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        pass
+    else:
+        count_cache_lookup('tiles', True)
+        return payload, mtime
+
+    count_cache_lookup('tiles', False)
+    payload = build_tile(zoom, x, y)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # write to a temporary file first so concurrent readers never see a partial tile
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    # files of earlier versions of the tile are never served again, reclaim their space
+    for stale in glob.glob(tile_path(zoom, x, y, '*')):
+        if stale != path:
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+
+    return payload, mtime
@@ -0,0 +1,61 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import List, Tuple
+from django.db import connections
+
+
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def query_shape(sql: str) -> str:
+    """
+    Normalize SQL so that queries differing only by their parameters, IN list lengths or inlined LIMIT and OFFSET
+    values have the same shape
+    """
+    sql = _PLACEHOLDER_LIST.sub('(%s...)', sql)
+    sql = _NUMBER.sub('N', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """
+    Context manager recording the SQL and duration, in seconds, of every query run on any database connection of
+    the current thread
+    """
+    def __init__(self):
+        self.queries: List[Tuple[str, float]] = []
+        self._wrappers = ExitStack()
+
+    def __enter__(self) -> 'QueryRecorder':
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrappers.close()
+
+    def _record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        return sum(duration for _, duration in self.queries)
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Return the query shapes run at least threshold times, most repeated first
+        """
+        shapes = Counter(query_shape(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
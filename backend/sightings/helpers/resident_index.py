@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Any, Optional
+from django.conf import settings
+
+
+class ResidentIndex:
+    """
+    Base of the in-process indexes over every Location. An index is loaded lazily on first use, kept up to date by
+    model signals, and reloaded after LOCATION_INDEX_TTL seconds so that writes made by other worker processes are
+    eventually picked up. Subclasses implement _build(), and read or update the state it returns under self._lock.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._state: Optional[Any] = None
+        self._loaded_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._state is not None
+
+    def _build(self) -> Any:
+        """
+        Query the database and return the state of the index. Called without holding the lock.
+        """
+        raise NotImplementedError
+
+    def _expired(self) -> bool:
+        ttl = getattr(settings, 'LOCATION_INDEX_TTL', None)
+        return ttl is not None and time.monotonic() - self._loaded_at > ttl
+
+    def _ensure_loaded(self) -> Any:
+        with self._lock:
+            if self._state is None or self._expired():
+                self.load()
+            return self._state
+
+    def load(self):
+        """
+        (Re)build the index from the database
+        """
+        state = self._build()
+        with self._lock:
+            self._state = state
+            self._loaded_at = time.monotonic()
+
+    def clear(self):
+        """
+        Drop the index; it will be rebuilt on next use
+        """
+        with self._lock:
+            self._state = None
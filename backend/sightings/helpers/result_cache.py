@@ -0,0 +1,74 @@
+import hashlib
+import json
+from typing import Any, List, Optional, Type
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db.models import Model
+from sightings.models import Location, Sighting
+from sightings.helpers.cache import versioned_key
+from sightings.helpers.metrics import count_cache_lookup
+
+
+RESULT_CACHE_ALIAS = 'results'
+
+# connections whose pages are cached, with the models whose writes can change a page, nested nodes included.
+# Post pages embed users, which have no version counter, so they are not cached.
+CACHED_CONNECTIONS = {
+    Location: (Location,),
+    Sighting: (Sighting, Location),
+}
+
+
+def get_result_cache() -> BaseCache:
+    """
+    Return the cache holding connection pages, bounded by RESULT_CACHE_MAX_ENTRIES
+    """
+    return caches[RESULT_CACHE_ALIAS]
+
+
+def _selection_tree(selections) -> List[Any]:
+    # aliases and the order of fields do not change the rows of a page, so they are left out
+    tree = [
+        [
+            getattr(selection, 'name', None),
+            getattr(selection, 'type_condition', None),
+            getattr(selection, 'arguments', None) or {},
+            _selection_tree(selection.selections),
+        ]
+        for selection in selections
+    ]
+    return sorted(tree, key=lambda node: json.dumps(node, sort_keys=True, default=str))
+
+
+def result_cache_key(model: Type[Model], field) -> Optional[str]:
+    """
+    Cache key of a connection page, or None if connections over model are not cached or RESULT_CACHE_ENABLED is
+    off. The key is a canonical hash of the field's arguments (filters, sort, countMode and pagination) and of its
+    selections, which decide the related rows and columns the optimizer fetches, and embeds the version counters of
+    every model the page depends on.
+    """
+    models = CACHED_CONNECTIONS.get(model)
+    if models is None or not settings.RESULT_CACHE_ENABLED:
+        return None
+
+    payload = json.dumps(
+        {'field': field.name, 'arguments': field.arguments, 'selections': _selection_tree(field.selections)},
+        sort_keys=True,
+        default=str,
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()
+    return versioned_key('connection-page', models, model._meta.label_lower, digest)
+
+
+def get_cached_result(key: Optional[str]) -> Optional[Any]:
+    if key is None:
+        return None
+
+    result = get_result_cache().get(key)
+    count_cache_lookup('connection_pages', result is not None)
+    return result
+
+
+def set_cached_result(key: Optional[str], result: Any):
+    if key is not None:
+        get_result_cache().set(key, result, settings.RESULT_CACHE_TIMEOUT)
@@ -0,0 +1,187 @@
+from typing import Dict, List, NamedTuple, Optional, Set
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, QuerySet, Value, When
+from sightings.helpers.resident_index import ResidentIndex
+
+
+SEARCH_FIELDS = ('city', 'state', 'state_name', 'country')
+
+# length of the n-grams kept by the in-process index; shorter terms are matched by the database
+NGRAM_SIZE = 3
+
+# above this many matching ids the in-process index hands a term back to the database: the ids are inlined into
+# the query as an IN list, which must stay short to be cheap to send, parse and plan
+MAX_INDEXED_MATCHES = 250
+
+
+def search_document(*values: Optional[str]) -> str:
+    """
+    Build the lowercased, space separated search document of a location from its searchable field values
+    """
+    return ' '.join(v.strip().lower() for v in values if v and v.strip())
+
+
+def search_terms(q: str) -> List[str]:
+    """
+    Split a query string into its distinct, lowercased terms
+    """
+    return list(dict.fromkeys(q.lower().split()))
+
+
+def ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def uses_database_search() -> bool:
+    """
+    True when the database has trigram indexes over Location.search_document (Postgres with pg_trgm)
+    """
+    return connection.vendor == 'postgresql'
+
+
+class _SearchState(NamedTuple):
+    documents: Dict[int, str]
+    postings: Dict[str, Set[int]]
+
+
+class SearchIndex(ResidentIndex):
+    """
+    Resident n-gram inverted index over Location.search_document, used on databases without trigram indexes. Kept
+    up to date by the Location post_save/post_delete signals.
+    """
+    def _build(self) -> _SearchState:
+        from sightings.models import Location
+
+        rows = list(Location.objects.values_list('id', 'search_document').iterator())
+        postings: Dict[str, Set[int]] = {}
+        for pk, document in rows:
+            for gram in ngrams(document):
+                postings.setdefault(gram, set()).add(pk)
+
+        return _SearchState(documents=dict(rows), postings=postings)
+
+    def add(self, pk: int, document: str):
+        """
+        Insert or update a location's document. No-op while the index is not loaded.
+        """
+        with self._lock:
+            if self._state is None:
+                return
+            self._unindex(pk)
+            self._state.documents[pk] = document
+            for gram in ngrams(document):
+                self._state.postings.setdefault(gram, set()).add(pk)
+
+    def remove(self, pk: int):
+        """
+        Remove a location. No-op while the index is not loaded.
+        """
+        with self._lock:
+            if self._state is None:
+                return
+            self._unindex(pk)
+
+    def _unindex(self, pk: int):
+        documents, postings = self._state
+        document = documents.pop(pk, None)
+        if document is None:
+            return
+
+        for gram in ngrams(document):
+            posting = postings.get(gram)
+            if posting is not None:
+                posting.discard(pk)
+                if not posting:
+                    del postings[gram]
+
+    def matches(self, term: str) -> Optional[Set[int]]:
+        """
+        Return the ids of every location whose document contains term, or None if the index cannot answer
+        selectively (term shorter than NGRAM_SIZE, or more than MAX_INDEXED_MATCHES matches)
+        """
+        if len(term) < NGRAM_SIZE:
+            return None
+
+        with self._lock:
+            documents, postings = self._ensure_loaded()
+            matches = sorted((postings.get(gram, set()) for gram in ngrams(term)), key=len)
+            candidates = set(matches[0]).intersection(*matches[1:])
+            found = {pk for pk in candidates if term in documents[pk]}
+
+        return found if len(found) <= MAX_INDEXED_MATCHES else None
+
+
+search_index = SearchIndex()
+
+
+def get_search_index() -> SearchIndex:
+    """
+    Return the process-wide Location search index
+    """
+    return search_index
+
+
+def search_term_q(term: str, prefix: str = '') -> Q:
+    """
+    Q object matching locations with any searchable field containing term
+    """
+    if not uses_database_search():
+        ids = get_search_index().matches(term)
+        if ids is not None:
+            return Q(**{f'{prefix}id__in': sorted(ids)})
+
+    # the term is lowercased like the document, so a plain LIKE suffices; on Postgres it is served by the
+    # trigram index
+    return Q(**{f'{prefix}search_document__contains': term})
+
+
+def search_q(q: str, prefix: str = '') -> Q:
+    """
+    Q object matching locations where every term of q is contained in at least one searchable field
+    """
+    query = Q()
+    for term in search_terms(q):
+        query &= search_term_q(term, prefix=prefix)
+
+    return query
+
+
+class WordSimilarity(Func):
+    """
+    pg_trgm word_similarity(query, document)
+    """
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+def search_rank(q: str):
+    """
+    Expression scoring how well a location matches q, higher is better. Uses trigram word similarity on Postgres,
+    and counts whole-field and prefix term matches elsewhere.
+    """
+    terms = search_terms(q)
+    if uses_database_search():
+        return WordSimilarity(Value(' '.join(terms)), F('search_document'))
+
+    rank = Value(0, output_field=IntegerField())
+    for term in terms:
+        exact = Q()
+        starts = Q()
+        for field in SEARCH_FIELDS:
+            exact |= Q(**{f'{field}__iexact': term})
+            starts |= Q(**{f'{field}__istartswith': term})
+        rank = rank + Case(
+            When(exact, then=Value(2)),
+            When(starts, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+
+    return rank
+
+
+def order_by_search_rank(locations: QuerySet, q: str) -> QuerySet:
+    """
+    Order a Location queryset by relevance to q, most relevant first, ties broken by id
+    """
+    return locations.annotate(search_rank=search_rank(q)).order_by('-search_rank', 'id')
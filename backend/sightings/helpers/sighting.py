@@ -1,20 +1,105 @@
-from datetime import datetime
+from datetime import datetime, time
 from django.db.models.query import QuerySet
 from django.db.models import Q
 from sightings.gql.types.sighting import SightingFilterInput
 from sightings.gql.types.location import LocationFilterInput
 from sightings.gql.types.sorting import SortInput
-from sightings.models import Sighting
-from sightings.helpers.common import get_order_by_field
-# from sightings.helpers.locations import locations_filter_sort
+from sightings.gql.types.datetime import DateTimeFilterInput
+from sightings.models import Location, Sighting
+from sightings.filters.boolean import AndFilter
+from sightings.filters.locations import WithinBoundsFilter
+from sightings.filters.validate import validate_filters, get_location_filters
+from sightings.helpers.sorting import SIGHTING_SORTS, sort_queryset
+from sightings.helpers.datetimes import time_to_seconds
 from sightings.helpers.geocoding import (
     find_sightings_by_distance_outside,
     find_sightings_by_distance_within,
+    generate_lat_lon_bounds_query,
 )
 
 
 def sightings_q_by_datetime_exact(dt: datetime):
-    return Q()
+    return Q(sighting_datetime=dt) if dt else Q()
+
+
+def sightings_q_by_datetime_after(dt: datetime):
+    return Q(sighting_datetime__gt=dt) if dt else Q()
+
+
+def sightings_q_by_datetime_before(dt: datetime):
+    return Q(sighting_datetime__lt=dt) if dt else Q()
+
+
+def sightings_q_by_datetime_in_range(start: datetime, end: datetime):
+    return Q(sighting_datetime__gte=start, sighting_datetime__lte=end)
+
+
+# Time of day filters compare the indexed sighting_time column, in seconds since midnight, rather than extracting
+# the time from sighting_datetime row by row. A range whose start is later than its end wraps midnight.
+def sightings_q_by_time_exact(t: time):
+    return Q(sighting_time=time_to_seconds(t)) if t else Q()
+
+
+def sightings_q_by_time_after(t: time):
+    return Q(sighting_time__gt=time_to_seconds(t)) if t else Q()
+
+
+def sightings_q_by_time_before(t: time):
+    return Q(sighting_time__lt=time_to_seconds(t)) if t else Q()
+
+
+def sightings_q_by_time_between(start: int, end: int, inclusive: bool = True):
+    """
+    Q object matching sightings with a time of day between start and end seconds since midnight, wrapping midnight
+    if start is later than end
+    """
+    lower = 'sighting_time__gte' if inclusive else 'sighting_time__gt'
+    upper = 'sighting_time__lte' if inclusive else 'sighting_time__lt'
+    if start <= end:
+        return Q(**{lower: start, upper: end})
+
+    return Q(**{lower: start}) | Q(**{upper: end})
+
+
+def sightings_q_by_time_in_range(start: time, end: time):
+    return sightings_q_by_time_between(time_to_seconds(start), time_to_seconds(end))
+
+
+def sightings_q_by_datetime_filter(datetime_filter: DateTimeFilterInput):
+    """
+    Combine every field of a DateTimeFilterInput into a single Q object
+    :param datetime_filter: DateTimeFilterInput object, already validated
+    :return: django Q object
+    """
+    query = (
+        sightings_q_by_datetime_exact(datetime_filter.datetime_exact) &
+        sightings_q_by_datetime_after(datetime_filter.datetime_after) &
+        sightings_q_by_datetime_before(datetime_filter.datetime_before) &
+        sightings_q_by_time_exact(datetime_filter.time_exact)
+    )
+
+    if datetime_filter.datetime_in_range:
+        query &= sightings_q_by_datetime_in_range(
+            datetime_filter.datetime_in_range.date_start,
+            datetime_filter.datetime_in_range.date_end,
+        )
+
+    if datetime_filter.time_in_range:
+        query &= sightings_q_by_time_in_range(
+            datetime_filter.time_in_range.time_start,
+            datetime_filter.time_in_range.time_end,
+        )
+    elif datetime_filter.time_after and datetime_filter.time_before:
+        query &= sightings_q_by_time_between(
+            time_to_seconds(datetime_filter.time_after),
+            time_to_seconds(datetime_filter.time_before),
+            inclusive=False,
+        )
+    else:
+        query &= sightings_q_by_time_after(datetime_filter.time_after)
+        query &= sightings_q_by_time_before(datetime_filter.time_before)
+
+    return query
 
 
 def filter_sightings_by_location(
@@ -22,18 +107,19 @@ def filter_sightings_by_location(
     sightings: QuerySet = None
 ):
     """
-    Filter sighting objects by location filter
+    Filter sighting objects by location filter. The location filters are compiled into a subquery on location_id,
+    so the result is still a single SQL statement that further sighting filters can be added to.
     :param location_filter: LocationFilterInput object
     :param sightings: QuerySet of Sightings
     """
-    # locations = locations_filter_sort(location_filter=location_filter)
-    # lids = [location.id for location in locations]
-    #
-    # if sightings:
-    #     return sightings.filter(location__id__in=lids)
-    #
-    # return Sighting.objects.all().filter(location__id__in=lids)
-    return Sighting.objects.all()
+    filters = get_location_filters(linput=location_filter)
+    validate_filters(filters)
+
+    locations = Location.objects.filter(AndFilter(filters).get_query()).values('id')
+    if sightings is None:
+        sightings = Sighting.objects.all()
+
+    return sightings.filter(location_id__in=locations)
 
 
 def sightings_filter_sort(
@@ -55,18 +141,35 @@ def sightings_filter_sort(
         location_filter = sighting_filter.location_filter
         datetime_filter = sighting_filter.datetime_filter
         location_ids = sighting_filter.location_ids
+        within_bounds = sighting_filter.within_bounds
     else:
-        location_filter = datetime_filter = location_ids = None
+        location_filter = datetime_filter = location_ids = within_bounds = None
 
     if location_filter:
-        sightings = filter_sightings_by_location(location_filter)
+        sightings = filter_sightings_by_location(location_filter, sightings)
 
     elif location_ids:
-        sightings = Sighting.objects.all().filter(location__id__in=location_ids)
+        sightings = sightings.filter(location__id__in=location_ids)
+
+    if within_bounds:
+        sightings = sightings.filter(generate_lat_lon_bounds_query(
+            within_bounds.west,
+            within_bounds.south,
+            within_bounds.east,
+            within_bounds.north,
+            prefix='location__',
+        ))
 
     if datetime_filter:
-        pass
+        sightings = sightings.filter(sightings_q_by_datetime_filter(datetime_filter))
 
     if sort:
-        pass
+        bounds = get_location_filters(linput=location_filter)
+        if within_bounds:
+            bounds.append(WithinBoundsFilter(
+                within_bounds.west, within_bounds.south, within_bounds.east, within_bounds.north
+            ))
+        sightings = sort_queryset(sightings, sort, SIGHTING_SORTS, bounded_area=AndFilter(bounds).bounded_area())
+
+    return sightings
 
@@ -0,0 +1,106 @@
+import math
+from typing import Callable, Dict, Optional, Sequence
+from django.conf import settings
+from django.db.models import ExpressionWrapper, FloatField, QuerySet
+from django.db.models.functions import Lower
+from sightings.gql.types.sorting import SortInput
+from sightings.exceptions import SortInputValidationException
+from sightings.helpers.common import get_order_by_field
+from sightings.helpers.distance import great_circle_distance
+from sightings.helpers.geocoding import validate_longitude_latitude
+
+
+class SortOption:
+    """
+    A public sort key, mapped to the indexed columns (or annotations) it orders by. The primary key is appended as a
+    unique tiebreaker by the keyset pagination, see sightings.helpers.keyset.
+    columns - columns or annotation names to order by, in order
+    annotate - optional function of the SortInput returning annotations the columns refer to
+    requires_point - the sort is relative to SortInput.point
+    requires_bounds - the sort cannot be served by an index, so the queryset must be restricted to a region of at most
+        DISTANCE_SORT_MAX_AREA
+    """
+    def __init__(
+        self,
+        columns: Sequence[str],
+        annotate: Optional[Callable[[SortInput], dict]] = None,
+        requires_point: bool = False,
+        requires_bounds: bool = False,
+    ):
+        self.columns = columns
+        self.annotate = annotate
+        self.requires_point = requires_point
+        self.requires_bounds = requires_bounds
+
+
+def _lower(*fields: str, prefix: str = '') -> Callable[[SortInput], dict]:
+    # matches the functional indexes on Location
+    return lambda sort: {f'sort_{field}': Lower(f'{prefix}{field}') for field in fields}
+
+
+def _distance(prefix: str = '') -> Callable[[SortInput], dict]:
+    return lambda sort: {
+        'distance': ExpressionWrapper(
+            great_circle_distance(sort.point.latitude, sort.point.longitude, prefix=prefix),
+            output_field=FloatField(),
+        )
+    }
+
+
+LOCATION_SORTS: Dict[str, SortOption] = {
+    'id': SortOption(['id']),
+    'country': SortOption(
+        ['sort_country', 'sort_state', 'sort_city'], annotate=_lower('country', 'state', 'city')
+    ),
+    'state': SortOption(['sort_state', 'sort_city'], annotate=_lower('state', 'city')),
+    'stateName': SortOption(['sort_state_name', 'sort_city'], annotate=_lower('state_name', 'city')),
+    'city': SortOption(['sort_city'], annotate=_lower('city')),
+    'distance': SortOption(['distance'], annotate=_distance(), requires_point=True, requires_bounds=True),
+}
+
+SIGHTING_SORTS: Dict[str, SortOption] = {
+    'id': SortOption(['id']),
+    'sightingDatetime': SortOption(['sighting_datetime']),
+    'sightingTime': SortOption(['sighting_time']),
+    'createdDatetime': SortOption(['created_datetime']),
+    'distance': SortOption(
+        ['distance'], annotate=_distance(prefix='location__'), requires_point=True, requires_bounds=True
+    ),
+}
+
+
+def sort_queryset(
+    queryset: QuerySet, sort: SortInput, sorts: Dict[str, SortOption], bounded_area: float = math.inf
+) -> QuerySet:
+    """
+    Validate a SortInput against a registry of sort options and order a queryset by it
+    :param queryset: queryset to sort
+    :param sort: SortInput object
+    :param sorts: registry of the sort options allowed for the queryset's model
+    :param bounded_area: area, in square meters, of the region the queryset is restricted to by spatial filters
+    :return: sorted queryset
+    """
+    option = sorts.get(sort.field)
+    if option is None:
+        raise SortInputValidationException(
+            f'Cannot sort by {sort.field}, valid fields are: {", ".join(sorts)}'
+        )
+
+    if option.requires_point:
+        if sort.point is None:
+            raise SortInputValidationException(f'Sorting by {sort.field} requires a point')
+        if not validate_longitude_latitude(sort.point.longitude, sort.point.latitude):
+            raise SortInputValidationException(
+                f'Invalid point: ({sort.point.latitude}, {sort.point.longitude})'
+            )
+
+    if option.requires_bounds and bounded_area > settings.DISTANCE_SORT_MAX_AREA:
+        raise SortInputValidationException(
+            f'Sorting by {sort.field} requires a withinBounds or distanceFrom (inside circle) filter covering at most '
+            f'{settings.DISTANCE_SORT_MAX_AREA / 1e6:.0f} square kilometers'
+        )
+
+    if option.annotate:
+        queryset = queryset.annotate(**option.annotate(sort))
+
+    return queryset.order_by(*(get_order_by_field(sort.order, column) for column in option.columns))
@@ -0,0 +1,259 @@
+import heapq
+import math
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sightings.helpers.distance import (
+    EARTH_MEAN_RADIUS,
+    EARTH_MIN_RADIUS_OF_CURVATURE,
+    GEODESIC_TOLERANCE,
+    GEODESIC_SLACK,
+    geodesic_distance,
+)
+from sightings.helpers.resident_index import ResidentIndex
+
+
+Point = Tuple[float, float, float]
+
+
+def to_unit_vector(latitude: float, longitude: float) -> Point:
+    """
+    Convert a (latitude, longitude) pair to a point on the unit sphere
+    """
+    lat = math.radians(latitude)
+    lon = math.radians(longitude)
+    cos_lat = math.cos(lat)
+    return cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat)
+
+
+def chord_for_arc(arc_length: float, radius: float = EARTH_MIN_RADIUS_OF_CURVATURE) -> float:
+    """
+    Return the straight-line distance between two points on the unit sphere separated by arc_length meters.
+    Uses the smallest radius of curvature by default so the chord never underestimates the geodesic arc.
+    """
+    angle = min(arc_length / radius, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def arc_for_chord(chord: float, radius: float = EARTH_MEAN_RADIUS) -> float:
+    """
+    Return the great-circle distance, in meters, matching a chord on the unit sphere
+    """
+    return 2 * radius * math.asin(min(chord / 2, 1.0))
+
+
+class _KDNode:
+    __slots__ = ('pk', 'point', 'axis', 'left', 'right', 'alive')
+
+    def __init__(self, pk: int, point: Point, axis: int):
+        self.pk = pk
+        self.point = point
+        self.axis = axis
+        self.left = None
+        self.right = None
+        self.alive = True
+
+
+class KDTree:
+    """
+    3-d tree over points on the unit sphere. Supports incremental inserts and removals; removed nodes are
+    tombstoned and the tree is rebuilt once it has drifted too far from balance.
+    """
+    def __init__(self, points: Iterable[Tuple[int, Point]] = ()):
+        self._nodes: Dict[int, _KDNode] = {}
+        self._root = None
+        self._dead = 0
+        self._inserted = 0
+        self._rebuild(list(points))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, pk: int):
+        return pk in self._nodes
+
+    def _rebuild(self, points: List[Tuple[int, Point]]):
+        self._nodes = {}
+        self._dead = 0
+        self._inserted = 0
+        self._root = self._build(points, 0)
+
+    def _build(self, points: List[Tuple[int, Point]], axis: int) -> Optional[_KDNode]:
+        if not points:
+            return None
+
+        points.sort(key=lambda p: p[1][axis])
+        median = len(points) // 2
+        pk, point = points[median]
+        node = _KDNode(pk, point, axis)
+        self._nodes[pk] = node
+        node.left = self._build(points[:median], (axis + 1) % 3)
+        node.right = self._build(points[median + 1:], (axis + 1) % 3)
+        return node
+
+    def _live_points(self) -> List[Tuple[int, Point]]:
+        return [(pk, node.point) for pk, node in self._nodes.items() if node.alive]
+
+    def insert(self, pk: int, point: Point):
+        """
+        Insert a point, replacing any existing point with the same pk
+        """
+        self.remove(pk)
+
+        if self._root is None:
+            self._root = _KDNode(pk, point, 0)
+            self._nodes[pk] = self._root
+            return
+
+        parent = self._root
+        while True:
+            side = 'left' if point[parent.axis] < parent.point[parent.axis] else 'right'
+            child = getattr(parent, side)
+            if child is None:
+                node = _KDNode(pk, point, (parent.axis + 1) % 3)
+                setattr(parent, side, node)
+                self._nodes[pk] = node
+                break
+            parent = child
+
+        self._inserted += 1
+        if self._inserted > max(len(self._nodes) // 2, 64):
+            self._rebuild(self._live_points())
+
+    def remove(self, pk: int):
+        """
+        Remove the point with the given pk, if present
+        """
+        node = self._nodes.pop(pk, None)
+        if node is None:
+            return
+
+        node.alive = False
+        self._dead += 1
+        if self._dead > max(len(self._nodes), 64):
+            self._rebuild(self._live_points())
+
+    def within(self, point: Point, radius: float) -> List[int]:
+        """
+        Return the pks of all points within a straight-line distance of radius from point
+        """
+        found = []
+        radius_sq = radius * radius
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            if node.alive:
+                p = node.point
+                if (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2 <= radius_sq:
+                    found.append(node.pk)
+
+            diff = point[node.axis] - node.point[node.axis]
+            if diff <= radius:
+                stack.append(node.left)
+            if diff >= -radius:
+                stack.append(node.right)
+
+        return found
+
+    def nearest(self, point: Point, k: int) -> List[Tuple[float, int]]:
+        """
+        Return up to k (straight-line distance, pk) pairs closest to point, nearest first
+        """
+        if k <= 0:
+            return []
+
+        # max-heap of the best k candidates, stored as (-distance squared, pk)
+        best: List[Tuple[float, int]] = []
+        # stack of (node, lower bound of the squared distance to any point in its subtree)
+        stack = [(self._root, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if node is None or (len(best) == k and bound >= -best[0][0]):
+                continue
+
+            if node.alive:
+                p = node.point
+                dist_sq = (p[0] - point[0]) ** 2 + (p[1] - point[1]) ** 2 + (p[2] - point[2]) ** 2
+                if len(best) < k:
+                    heapq.heappush(best, (-dist_sq, node.pk))
+                elif dist_sq < -best[0][0]:
+                    heapq.heapreplace(best, (-dist_sq, node.pk))
+
+            diff = point[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            # visit the near side first
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+
+        return sorted((math.sqrt(-d), pk) for d, pk in best)
+
+
+class _SpatialState(NamedTuple):
+    tree: KDTree
+    coordinates: Dict[int, Tuple[float, float]]
+
+
+class LocationIndex(ResidentIndex):
+    """
+    Resident spatial index over every Location, kept up to date by the Location post_save/post_delete signals
+    """
+    def _build(self) -> _SpatialState:
+        from sightings.models import Location
+
+        rows = [(pk, float(lat), float(lon)) for pk, lat, lon in
+                Location.objects.values_list('id', 'latitude', 'longitude').iterator()]
+        return _SpatialState(
+            tree=KDTree((pk, to_unit_vector(lat, lon)) for pk, lat, lon in rows),
+            coordinates={pk: (lat, lon) for pk, lat, lon in rows},
+        )
+
+    def add(self, pk: int, latitude: float, longitude: float):
+        """
+        Insert or move a location. No-op while the index is not loaded.
+        """
+        with self._lock:
+            if self._state is None:
+                return
+            self._state.coordinates[pk] = (float(latitude), float(longitude))
+            self._state.tree.insert(pk, to_unit_vector(float(latitude), float(longitude)))
+
+    def remove(self, pk: int):
+        """
+        Remove a location. No-op while the index is not loaded.
+        """
+        with self._lock:
+            if self._state is None:
+                return
+            self._state.coordinates.pop(pk, None)
+            self._state.tree.remove(pk)
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> List[Tuple[float, int]]:
+        """
+        Return up to k (geodesic distance in meters, id) pairs nearest to (latitude, longitude), nearest first
+        """
+        with self._lock:
+            tree, coordinates = self._ensure_loaded()
+            point = to_unit_vector(latitude, longitude)
+            nearest = tree.nearest(point, k)
+            if not nearest:
+                return []
+
+            # ordering by chord is ordering on the sphere; widen the search so that any location that is
+            # closer on the ellipsoid than the k-th spherical neighbour is also considered
+            reach = arc_for_chord(nearest[-1][0]) * (1 + 2 * GEODESIC_TOLERANCE) + GEODESIC_SLACK
+            candidates = tree.within(point, chord_for_arc(reach))
+            rows = [(pk, *coordinates[pk]) for pk in candidates]
+
+        ranked = sorted((geodesic_distance(lat, lon, latitude, longitude), pk) for pk, lat, lon in rows)
+        return ranked[:k]
+
+
+location_index = LocationIndex()
+
+
+def get_location_index() -> LocationIndex:
+    """
+    Return the process-wide Location spatial index
+    """
+    return location_index
@@ -0,0 +1,149 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db.models import Count
+from sightings.exceptions import LocationInputValidationException
+from sightings.helpers.resident_index import ResidentIndex
+from sightings.helpers.search import SEARCH_FIELDS
+
+
+Names = Tuple[Optional[str], ...]
+
+
+class Suggestion:
+    """
+    A distinct location name, with the number of locations carrying it and the number of sightings at them
+    """
+    __slots__ = ('kind', 'name', 'key', 'location_count', 'sighting_count')
+
+    def __init__(self, kind: str, name: str, key: str):
+        self.kind = kind
+        self.name = name
+        self.key = key
+        self.location_count = 0
+        self.sighting_count = 0
+
+    def rank(self):
+        return -self.sighting_count, -self.location_count, self.key, self.kind
+
+
+class _TrieNode:
+    __slots__ = ('children', 'suggestions', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.suggestions: Dict[str, Suggestion] = {}
+        # best suggestions of the subtree, computed lazily and dropped when an entry below changes
+        self.top: Optional[List[Suggestion]] = None
+
+
+def location_names(city: Optional[str], state: Optional[str], state_name: Optional[str],
+                   country: Optional[str]) -> Names:
+    """
+    Return the searchable names of a location, in SEARCH_FIELDS order
+    """
+    return city, state, state_name, country
+
+
+class SuggestionIndex(ResidentIndex):
+    """
+    Resident prefix trie over the distinct city, state, state name and country values of every Location, with
+    per-name location and sighting counts. Kept up to date by the Location and Sighting signals.
+    """
+    @property
+    def max_suggestions(self) -> int:
+        return settings.MAX_LOCATION_SUGGESTIONS
+
+    def _build(self) -> _TrieNode:
+        # a single aggregate query
+        from sightings.models import Location
+
+        rows = (
+            Location.objects
+            .values_list(*SEARCH_FIELDS)
+            .annotate(locations=Count('id', distinct=True), sightings=Count('sighting'))
+            .order_by()
+        )
+
+        root = _TrieNode()
+        for row in rows.iterator():
+            names, locations, sightings = row[:len(SEARCH_FIELDS)], row[-2], row[-1]
+            self._adjust_names(root, names, locations, sightings)
+
+        return root
+
+    def _adjust_names(self, root: _TrieNode, names: Names, locations: int, sightings: int):
+        for kind, name in zip(SEARCH_FIELDS, names):
+            if name and name.strip():
+                self._adjust(root, kind, name.strip(), locations, sightings)
+
+    @staticmethod
+    def _adjust(root: _TrieNode, kind: str, name: str, locations: int, sightings: int):
+        key = name.lower()
+        node = root
+        node.top = None
+        for char in key:
+            node = node.children.setdefault(char, _TrieNode())
+            node.top = None
+
+        suggestion = node.suggestions.get(kind)
+        if suggestion is None:
+            suggestion = node.suggestions[kind] = Suggestion(kind, name, key)
+
+        suggestion.location_count += locations
+        suggestion.sighting_count = max(suggestion.sighting_count + sightings, 0)
+        if suggestion.location_count <= 0:
+            del node.suggestions[kind]
+
+    def adjust(self, names: Names, locations: int = 0, sightings: int = 0):
+        """
+        Add to the location and sighting counts of a location's names. No-op while the trie is not loaded.
+        """
+        with self._lock:
+            if self._state is None:
+                return
+            self._adjust_names(self._state, names, locations, sightings)
+
+    def _top(self, node: _TrieNode) -> List[Suggestion]:
+        if node.top is None:
+            candidates = list(node.suggestions.values())
+            for child in node.children.values():
+                candidates.extend(self._top(child))
+            node.top = heapq.nsmallest(self.max_suggestions, candidates, key=Suggestion.rank)
+
+        return node.top
+
+    def suggest(self, prefix: str, limit: int) -> List[Suggestion]:
+        """
+        Return up to limit names starting with prefix, case-insensitively, those with the most sightings first
+        """
+        with self._lock:
+            node = self._ensure_loaded()
+            for char in prefix.strip().lower():
+                node = node.children.get(char)
+                if node is None:
+                    return []
+
+            return self._top(node)[:limit]
+
+
+suggestion_index = SuggestionIndex()
+
+
+def get_suggestion_index() -> SuggestionIndex:
+    """
+    Return the process-wide location name suggestion index
+    """
+    return suggestion_index
+
+
+def suggest_location_names(prefix: str, limit: int) -> List[Suggestion]:
+    """
+    Validate input and return up to limit location names starting with prefix, those with the most sightings first
+    """
+    if not 0 < limit <= settings.MAX_LOCATION_SUGGESTIONS:
+        raise LocationInputValidationException(
+            f'limit must be between 1 and {settings.MAX_LOCATION_SUGGESTIONS}, got {limit}'
+        )
+
+    return get_suggestion_index().suggest(prefix, limit)
@@ -0,0 +1,59 @@
+from typing import List, Tuple
+
+
+# deepest zoom level served by tile based endpoints
+MAX_TILE_ZOOM = 18
+
+
+def tile_size(zoom: int) -> float:
+    """
+    Return the edge length, in degrees, of a tile at the given zoom level. Tiles follow Cesium's
+    GeographicTilingScheme: level 0 is two 180 degree tiles side by side, and every level splits each tile in four.
+    """
+    return 180.0 / (1 << zoom)
+
+
+def tile_count(zoom: int) -> Tuple[int, int]:
+    """
+    Return the number of (columns, rows) of tiles at the given zoom level
+    """
+    return 2 << zoom, 1 << zoom
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Return the (west, south, east, north) bounds of a tile. x counts eastwards from the antimeridian and y counts
+    southwards from the north pole.
+    """
+    size = tile_size(zoom)
+    west = -180.0 + x * size
+    north = 90.0 - y * size
+    return west, north - size, west + size, north
+
+
+def tile_for_point(zoom: int, latitude: float, longitude: float) -> Tuple[int, int]:
+    """
+    Return the (x, y) of the tile containing a point at the given zoom level
+    """
+    size = tile_size(zoom)
+    columns, rows = tile_count(zoom)
+    x = min(int((longitude + 180.0) // size), columns - 1)
+    y = min(int((90.0 - latitude) // size), rows - 1)
+    return max(x, 0), max(y, 0)
+
+
+def tiles_for_bounds(zoom: int, west: float, south: float, east: float, north: float) -> List[Tuple[int, int]]:
+    """
+    Return the (x, y) of every tile intersecting a (west, south, east, north) rectangle. A rectangle whose west
+    edge lies east of its east edge crosses the antimeridian.
+    """
+    x_start, y_start = tile_for_point(zoom, north, west)
+    x_end, y_end = tile_for_point(zoom, south, east)
+    columns, _ = tile_count(zoom)
+
+    if west <= east:
+        xs = list(range(x_start, x_end + 1))
+    else:
+        xs = list(range(x_start, columns)) + list(range(0, x_end + 1))
+
+    return [(x, y) for y in range(y_start, y_end + 1) for x in xs]
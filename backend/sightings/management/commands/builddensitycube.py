@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from sightings.helpers.density import rebuild_density_cube
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sighting density cube (sightings per grid cell and month) from scratch'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Building sighting density cube...')
+        cells = rebuild_density_cube()
+        self.stdout.write(self.style.SUCCESS(f'Done. {cells} non-empty cells written.'))
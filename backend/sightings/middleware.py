@@ -0,0 +1,88 @@
+import logging
+import time
+from django.conf import settings
+from sightings.exceptions import QueryBudgetExceededException
+from sightings.helpers.metrics import DB_DURATION, DB_QUERIES, GRAPHQL_OPERATION_DURATION, get_registry
+from sightings.helpers.queries import QueryRecorder
+
+
+logger = logging.getLogger(__name__)
+
+
+def request_operation(request) -> str:
+    """
+    Name of the operation served by a request, the GraphQL operation name when the GraphQL view recorded one and
+    the path otherwise
+    """
+    return getattr(request, 'graphql_operation_name', None) or request.path
+
+
+def _metrics_operation(request) -> str:
+    # operation names are chosen by clients, only those of METRICS_OPERATIONS get their own label; routes rather
+    # than paths, so that every tile shares one label
+    if hasattr(request, 'graphql_operation_name'):
+        name = request.graphql_operation_name
+        if not name:
+            return 'anonymous'
+        return name if name in settings.METRICS_OPERATIONS else 'other'
+    match = request.resolver_match
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    """
+    Record the latency of GraphQL operations, and the number and duration of the database queries of every
+    request, see sightings.helpers.metrics. Queries are counted by QueryBudgetMiddleware, which must come after
+    this middleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        operation = _metrics_operation(request)
+        if hasattr(request, 'graphql_operation_name'):
+            GRAPHQL_OPERATION_DURATION.observe(duration, operation=operation)
+        recorder = getattr(request, 'query_recorder', None)
+        if recorder is not None:
+            DB_QUERIES.observe(recorder.count, operation=operation)
+            DB_DURATION.observe(recorder.duration, operation=operation)
+        get_registry().flush_if_due()
+
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Count the database queries of every request and flag those running more than their budget (QUERY_BUDGETS by
+    operation name, QUERY_BUDGET otherwise) or repeating a query shape at least N_PLUS_ONE_THRESHOLD times, the
+    signature of a relation resolved once per row. Flagged requests are logged, or raise
+    QueryBudgetExceededException when QUERY_BUDGET_RAISE is set. The recorder is left on the request as
+    query_recorder, for MetricsMiddleware.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.query_recorder = QueryRecorder()
+        with request.query_recorder as recorder:
+            response = self.get_response(request)
+
+        operation = request_operation(request)
+        budget = settings.QUERY_BUDGETS.get(operation, settings.QUERY_BUDGET)
+        problems = []
+        if recorder.count > budget:
+            problems.append(f'{recorder.count} queries, over the budget of {budget}')
+        for shape, count in recorder.repeated_shapes(settings.N_PLUS_ONE_THRESHOLD):
+            problems.append(f'{count} repeated queries (possible N+1): {shape}')
+
+        if problems:
+            message = f'{operation}: ' + '; '.join(problems)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceededException(message)
+            logger.warning(message)
+
+        return response
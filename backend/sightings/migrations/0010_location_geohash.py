@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-17 17:58
+
+from django.db import migrations, models
+from sightings.helpers.geohash import encode
+
+
+def populate_geohash(apps, schema_editor):
+    Location = apps.get_model('sightings', 'Location')
+    batch = []
+    for location in Location.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        location.geohash = encode(float(location.latitude), float(location.longitude))
+        batch.append(location)
+        if len(batch) >= 2000:
+            Location.objects.bulk_update(batch, ['geohash'])
+            batch = []
+
+    Location.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0009_location_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohash, migrations.RunPython.noop),
+    ]
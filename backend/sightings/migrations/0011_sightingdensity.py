@@ -0,0 +1,27 @@
+# Generated by Django 3.2.15 on 2026-10-17 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0010_location_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SightingDensity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell_x', models.PositiveSmallIntegerField()),
+                ('cell_y', models.PositiveSmallIntegerField()),
+                ('month', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sightingdensity',
+            constraint=models.UniqueConstraint(fields=('month', 'cell_y', 'cell_x'), name='unique_sighting_density'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.15 on 2026-10-17 19:02
+
+from django.db import migrations, models
+from sightings.helpers.search import search_document
+
+
+def populate_search_document(apps, schema_editor):
+    Location = apps.get_model('sightings', 'Location')
+    batch = []
+    for location in Location.objects.only('id', 'city', 'state', 'state_name', 'country').iterator(chunk_size=2000):
+        location.search_document = search_document(
+            location.city, location.state, location.state_name, location.country
+        )
+        batch.append(location)
+        if len(batch) >= 2000:
+            Location.objects.bulk_update(batch, ['search_document'])
+            batch = []
+
+    Location.objects.bulk_update(batch, ['search_document'])
+
+
+def create_trigram_index(apps, schema_editor):
+    # trigram indexes are Postgres only; other databases use the in-process index in sightings.helpers.search
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX location_search_trgm_idx ON sightings_location USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS location_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0011_sightingdensity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
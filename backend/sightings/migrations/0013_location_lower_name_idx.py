@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-17 18:07
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0012_location_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.text.Lower('country'), django.db.models.functions.text.Lower('state'), django.db.models.functions.text.Lower('city'), name='location_ctry_state_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.text.Lower('state'), django.db.models.functions.text.Lower('city'), name='location_state_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.text.Lower('state_name'), django.db.models.functions.text.Lower('city'), name='location_sname_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.db.models.functions.text.Lower('city'), name='location_city_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.15 on 2026-10-17 18:08
+
+from django.db import migrations, models
+from sightings.helpers.datetimes import seconds_since_midnight
+
+
+def populate_sighting_time(apps, schema_editor):
+    Sighting = apps.get_model('sightings', 'Sighting')
+    batch = []
+    for sighting in Sighting.objects.only('id', 'sighting_datetime').iterator(chunk_size=2000):
+        sighting.sighting_time = seconds_since_midnight(sighting.sighting_datetime)
+        batch.append(sighting)
+        if len(batch) >= 2000:
+            Sighting.objects.bulk_update(batch, ['sighting_time'])
+            batch = []
+
+    Sighting.objects.bulk_update(batch, ['sighting_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0013_location_lower_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sighting',
+            name='sighting_time',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='sighting',
+            name='sighting_datetime',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.RunPython(populate_sighting_time, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sightings', '0014_sighting_time'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sighting',
+            name='created_datetime',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
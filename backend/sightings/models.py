@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
 
+# enables field__lower=value lookups, which the functional indexes on Location serve
+models.CharField.register_lookup(Lower)
+
+
 class LocationManager(models.Manager):
     def get_by_natural_key(self, longitude, latitude):
         return self.get(longitude=longitude, latitude=latitude)
@@ -121,6 +126,10 @@ class Location(models.Model):
     country = models.CharField(max_length=64, default=None, blank=True, null=True)
     longitude = models.DecimalField(max_digits=17, decimal_places=14)
     latitude = models.DecimalField(max_digits=17, decimal_places=14)
+    # derived from latitude/longitude on save, see sightings.signals
+    geohash = models.CharField(max_length=12, default='', blank=True, db_index=True, editable=False)
+    # derived from city/state/state_name/country on save, see sightings.signals and sightings.helpers.search
+    search_document = models.TextField(default='', blank=True, editable=False)
 
     objects = LocationManager()
 
@@ -128,6 +137,14 @@ class Location(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['longitude', 'latitude'], name='unique_location'),
         ]
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='location_lat_lon_idx'),
+            # case-insensitive exact filters, see sightings.helpers.locations
+            models.Index(Lower('country'), Lower('state'), Lower('city'), name='location_ctry_state_city_idx'),
+            models.Index(Lower('state'), Lower('city'), name='location_state_city_idx'),
+            models.Index(Lower('state_name'), Lower('city'), name='location_sname_city_idx'),
+            models.Index(Lower('city'), name='location_city_idx'),
+        ]
 
     def __str__(self):
         s = '{0}, {1}'.format(self.state, self.country) if self.state else '{0}'.format(self.country)
@@ -140,9 +157,11 @@ class Sighting(models.Model):
     """
 
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
-    sighting_datetime = models.DateTimeField()
+    sighting_datetime = models.DateTimeField(db_index=True)
+    # seconds since midnight of sighting_datetime, in the current time zone; derived on save, see sightings.signals
+    sighting_time = models.PositiveIntegerField(default=0, db_index=True, editable=False)
     # Meta info
-    created_datetime = models.DateTimeField(auto_now_add=True)
+    created_datetime = models.DateTimeField(auto_now_add=True, db_index=True)
     modified_datetime = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -150,6 +169,30 @@ class Sighting(models.Model):
             .format(self.sighting_datetime, self.location.__str__(),)
 
 
+class SightingDensity(models.Model):
+    """
+    Model representing the number of sightings recorded in a particular grid cell during a particular month.
+    Together these rows form a space-time density cube used to render heatmaps.
+    """
+    CELL_SIZE = 1.0  # degrees
+
+    # column, counting eastwards from the antimeridian
+    cell_x = models.PositiveSmallIntegerField()
+    # row, counting northwards from the south pole
+    cell_y = models.PositiveSmallIntegerField()
+    # first day of the month
+    month = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'cell_y', 'cell_x'], name='unique_sighting_density'),
+        ]
+
+    def __str__(self):
+        return 'Cell ({0}, {1}), {2}: {3}'.format(self.cell_x, self.cell_y, self.month, self.count)
+
+
 class Post(models.Model):
     """
     Model representing a particular post of a ufo sighting made by a user. This is distinguished from a
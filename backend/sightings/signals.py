@@ -0,0 +1,267 @@
+import threading
+from django.db import transaction
+from django.db.models.signals import pre_delete, pre_save, post_save, post_delete
+from django.dispatch import receiver
+from sightings.models import Location, Post, Sighting
+from sightings.helpers import geohash
+from sightings.helpers.cache import bump_model_version
+from sightings.helpers.datetimes import seconds_since_midnight
+from sightings.helpers.density import adjust_density, move_location_density, uncount_location_density
+from sightings.helpers.search import get_search_index, search_document
+from sightings.helpers.spatial_index import get_location_index
+from sightings.helpers.suggestions import get_suggestion_index, location_names
+
+
+@receiver(pre_save, sender=Location)
+def set_location_geohash(sender, instance: Location, **kwargs):
+    """
+    Keep the geohash column in sync with the coordinates, including rows loaded from fixtures
+    """
+    instance.geohash = geohash.encode(float(instance.latitude), float(instance.longitude))
+
+
+@receiver(pre_save, sender=Location)
+def set_location_search_document(sender, instance: Location, **kwargs):
+    """
+    Keep the search document in sync with the searchable fields, including rows loaded from fixtures
+    """
+    instance.search_document = search_document(instance.city, instance.state, instance.state_name, instance.country)
+
+
+@receiver(post_save, sender=Location)
+def search_index_saved_location(sender, instance: Location, **kwargs):
+    """
+    Keep the in-process search index in sync with saved locations once the transaction commits
+    """
+    pk, document = instance.pk, instance.search_document
+    transaction.on_commit(lambda: get_search_index().add(pk, document))
+
+
+@receiver(post_delete, sender=Location)
+def search_unindex_deleted_location(sender, instance: Location, **kwargs):
+    """
+    Remove deleted locations from the in-process search index once the transaction commits
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: get_search_index().remove(pk))
+
+
+@receiver(post_save, sender=Location)
+def index_saved_location(sender, instance: Location, **kwargs):
+    """
+    Keep the spatial index in sync with saved locations once the transaction commits
+    """
+    pk, latitude, longitude = instance.pk, instance.latitude, instance.longitude
+    transaction.on_commit(lambda: get_location_index().add(pk, latitude, longitude))
+
+
+@receiver(post_delete, sender=Location)
+def unindex_deleted_location(sender, instance: Location, **kwargs):
+    """
+    Remove deleted locations from the spatial index once the transaction commits
+    """
+    pk = instance.pk
+    transaction.on_commit(lambda: get_location_index().remove(pk))
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=Sighting)
+@receiver(post_delete, sender=Sighting)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_cached_results(sender, **kwargs):
+    """
+    Bump the model version counter so that cached results derived from the model are no longer used
+    """
+    transaction.on_commit(lambda: bump_model_version(sender))
+
+
+@receiver(pre_save, sender=Sighting)
+def set_sighting_time(sender, instance: Sighting, **kwargs):
+    """
+    Keep the time of day column in sync with sighting_datetime, including rows loaded from fixtures
+    """
+    instance.sighting_time = seconds_since_midnight(instance.sighting_datetime)
+
+
+# locations being deleted by this thread, by id. Their sightings are deleted by the cascade, which would otherwise
+# load the location of every sighting again; the density cube is updated for all of them at once.
+_deleting = threading.local()
+
+
+def _deleting_locations() -> dict:
+    if not hasattr(_deleting, 'locations'):
+        _deleting.locations = {}
+    return _deleting.locations
+
+
+def _location(sighting: Sighting) -> Location:
+    return _deleting_locations().get(sighting.location_id) or sighting.location
+
+
+def _density_key(sighting: Sighting):
+    location = _location(sighting)
+    return location.latitude, location.longitude, sighting.sighting_datetime
+
+
+@receiver(pre_delete, sender=Location)
+def uncount_deleted_location_sightings(sender, instance: Location, **kwargs):
+    """
+    Remove the sightings of a deleted location from the density cube in bulk, before the cascade deletes them
+    """
+    _deleting_locations()[instance.pk] = instance
+    uncount_location_density(instance.pk, instance.latitude, instance.longitude)
+
+
+@receiver(post_delete, sender=Location)
+def forget_deleted_location(sender, instance: Location, **kwargs):
+    """
+    The cascade has deleted the sightings of the location by the time it is deleted itself
+    """
+    _deleting_locations().pop(instance.pk, None)
+
+
+@receiver(pre_save, sender=Sighting)
+def remember_sighting_density_key(sender, instance: Sighting, raw: bool = False, **kwargs):
+    """
+    Remember the location of an existing sighting, and where it was counted in the density cube, before it is
+    updated
+    """
+    instance._previous_density_key = None
+    instance._previous_location_id = None
+    instance._previous_location_names = None
+    if raw or instance.pk is None:
+        return
+
+    previous = Sighting.objects.filter(pk=instance.pk).values_list(
+        'location__latitude', 'location__longitude', 'sighting_datetime', 'location_id',
+        'location__city', 'location__state', 'location__state_name', 'location__country',
+    ).first()
+    if previous is not None:
+        instance._previous_density_key = previous[:3]
+        instance._previous_location_id = previous[3]
+        instance._previous_location_names = location_names(*previous[4:])
+
+
+@receiver(post_save, sender=Sighting)
+def count_saved_sighting(sender, instance: Sighting, created: bool, raw: bool = False, **kwargs):
+    """
+    Keep the density cube in sync with inserted or moved sightings. Raw saves (loaddata) are skipped; run the
+    builddensitycube command after loading fixtures.
+    """
+    if raw:
+        return
+
+    previous = getattr(instance, '_previous_density_key', None)
+    current = _density_key(instance)
+    if not created and previous == current:
+        return
+
+    if previous is not None:
+        adjust_density(*previous, delta=-1)
+    adjust_density(*current, delta=1)
+
+
+@receiver(post_delete, sender=Sighting)
+def uncount_deleted_sighting(sender, instance: Sighting, **kwargs):
+    """
+    Remove deleted sightings from the density cube, unless their location is being deleted
+    """
+    if instance.location_id not in _deleting_locations():
+        adjust_density(*_density_key(instance), delta=-1)
+
+
+@receiver(pre_save, sender=Location)
+def remember_location_coordinates(sender, instance: Location, raw: bool = False, **kwargs):
+    """
+    Remember the coordinates and names of an existing location before it is updated
+    """
+    instance._previous_coordinates = None
+    instance._previous_names = None
+    if raw or instance.pk is None:
+        return
+
+    previous = Location.objects.filter(pk=instance.pk).values_list(
+        'latitude', 'longitude', 'city', 'state', 'state_name', 'country'
+    ).first()
+    if previous is not None:
+        instance._previous_coordinates = previous[:2]
+        instance._previous_names = location_names(*previous[2:])
+
+
+@receiver(post_save, sender=Location)
+def move_location_density_cells(sender, instance: Location, created: bool, raw: bool = False, **kwargs):
+    """
+    Keep the density cube in sync with moved locations, whose sightings are counted in the cell of their location.
+    Raw saves (loaddata) are skipped; run the builddensitycube command after loading fixtures.
+    """
+    previous = getattr(instance, '_previous_coordinates', None)
+    if raw or created or previous is None:
+        return
+
+    move_location_density(instance.pk, previous, (instance.latitude, instance.longitude))
+
+
+def _names(location: Location):
+    return location_names(location.city, location.state, location.state_name, location.country)
+
+
+@receiver(post_save, sender=Location)
+def suggest_saved_location(sender, instance: Location, created: bool, **kwargs):
+    """
+    Keep the suggestion trie in sync with inserted or renamed locations once the transaction commits
+    """
+    index = get_suggestion_index()
+    current = _names(instance)
+    previous = getattr(instance, '_previous_names', None)
+
+    if created:
+        transaction.on_commit(lambda: index.adjust(current, locations=1))
+    elif previous is not None and previous != current:
+        sightings = instance.sighting_set.count() if index.loaded else 0
+
+        def rename():
+            index.adjust(previous, locations=-1, sightings=-sightings)
+            index.adjust(current, locations=1, sightings=sightings)
+
+        transaction.on_commit(rename)
+
+
+@receiver(post_delete, sender=Location)
+def unsuggest_deleted_location(sender, instance: Location, **kwargs):
+    """
+    Remove deleted locations from the suggestion trie once the transaction commits. Their sightings are
+    uncounted by their own post_delete signals.
+    """
+    names = _names(instance)
+    transaction.on_commit(lambda: get_suggestion_index().adjust(names, locations=-1))
+
+
+@receiver(post_save, sender=Sighting)
+def suggest_saved_sighting(sender, instance: Sighting, created: bool, **kwargs):
+    """
+    Keep the per-name sighting counts of the suggestion trie in sync with inserted or moved sightings once the
+    transaction commits
+    """
+    previous = getattr(instance, '_previous_location_names', None)
+    if not created and (previous is None or instance._previous_location_id == instance.location_id):
+        return
+
+    current = _names(instance.location)
+
+    def move():
+        if previous is not None:
+            get_suggestion_index().adjust(previous, sightings=-1)
+        get_suggestion_index().adjust(current, sightings=1)
+
+    transaction.on_commit(move)
+
+
+@receiver(post_delete, sender=Sighting)
+def unsuggest_deleted_sighting(sender, instance: Sighting, **kwargs):
+    """
+    Remove deleted sightings from the per-name sighting counts of the suggestion trie once the transaction commits
+    """
+    names = _names(_location(instance))
+    transaction.on_commit(lambda: get_suggestion_index().adjust(names, sightings=-1))
@@ -1,3 +1,919 @@
-from django.test import TestCase
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+from datetime import date, datetime, timezone
+from typing import Tuple
+from unittest import skipIf
+from unittest.mock import patch
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone as dj_timezone
+from strawberry_django_plus.relay import from_base64
+from sightings.exceptions import QueryBudgetExceededException
+from sightings.filters.locations import WithinBoundsFilter
+from sightings.gql.persisted_queries import register_persisted_query
+from sightings.helpers import geohash
+from sightings.helpers.clustering import cluster_sightings
+from sightings.helpers.density import adjust_density, density_cell, density_slice, rebuild_density_cube
+from sightings.helpers.distance import EARTH_MEAN_RADIUS, bounding_boxes, geodesic_distance
+from sightings.helpers.metrics import count_cache_lookup, get_registry
+from sightings.helpers.geocoding import (
+    find_locations_by_distance_outside,
+    find_locations_by_distance_within,
+    generate_lat_lon_bounding_box_query,
+)
+from sightings.helpers.queries import QueryRecorder, query_shape
+from sightings.helpers.search import get_search_index, search_term_q, uses_database_search
+from sightings.helpers.spatial_index import get_location_index
+from sightings.helpers.suggestions import get_suggestion_index
+from sightings.models import Location, Post, Profile, Sighting, SightingDensity
 
-# Create your tests here.
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class GraphQLTestCase(TestCase):
+    """
+    Test case running GraphQL operations through the API view, QueryBudgetMiddleware included, with helpers
+    asserting how many queries they run. Caches and in-process indexes are reset before each test so that query
+    counts do not depend on test order.
+    """
+    endpoint = '/api/'
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        get_search_index().clear()
+        get_suggestion_index().clear()
+        get_location_index().clear()
+
+    def execute(self, query: str, variables: dict = None, operation_name: str = None) -> dict:
+        """
+        Run an operation and return its data, failing on errors
+        """
+        body = {'query': query, 'variables': variables, 'operationName': operation_name}
+        response = self.client.post(self.endpoint, json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        result = response.json()
+        self.assertIsNone(result.get('errors'), result.get('errors'))
+        return result['data']
+
+    def assertGraphQLQueries(self, num: int, query: str, variables: dict = None, operation_name: str = None) -> dict:
+        """
+        Run an operation, asserting that it runs exactly num database queries, and return its data
+        """
+        with self.assertNumQueries(num):
+            return self.execute(query, variables=variables, operation_name=operation_name)
+
+
+class OperationQueryCountTests(GraphQLTestCase):
+    """
+    Number of queries run by each GraphQL operation, independent of the number of rows returned
+    """
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create(username=f'user{i}') for i in range(3)]
+        locations = [
+            Location.objects.create(city=f'City {i}', state='CA', country='USA', latitude=30 + i, longitude=-120 + i)
+            for i in range(6)
+        ]
+        sightings = [
+            Sighting.objects.create(location=location, sighting_datetime=datetime(2000 + i, 1, 1, tzinfo=timezone.utc))
+            for i, location in enumerate(locations)
+        ]
+        posts = [
+            Post.objects.create(user=users[i % len(users)], sighting=sighting, duration='1 minute', description='')
+            for i, sighting in enumerate(sightings)
+        ]
+        for user in users:
+            Profile.objects.create(user=user).favorites.set(posts)
+
+    def test_location_connection(self):
+        data = self.assertGraphQLQueries(2, '''
+            query Locations {
+                locationConnection(first: 5) { totalCount edges { node { id city state } } }
+            }
+        ''')
+        self.assertEqual(data['locationConnection']['totalCount'], 6)
+        self.assertEqual(len(data['locationConnection']['edges']), 5)
+
+    def test_location_connection_filtered(self):
+        # without trigram indexes, the first search also loads the in-process search index
+        self.assertGraphQLQueries(1 if uses_database_search() else 2, '''
+            query Locations($q: String) {
+                locationConnection(first: 5, locationFilter: {q: $q}) { edges { node { id city } } }
+            }
+        ''', variables={'q': 'city'})
+
+    def test_sighting_connection(self):
+        data = self.assertGraphQLQueries(2, '''
+            query Sightings {
+                sightingConnection(first: 5) {
+                    totalCount
+                    edges { node { id sightingDatetime location { id city } } }
+                }
+            }
+        ''')
+        self.assertEqual(len(data['sightingConnection']['edges']), 5)
+
+    def test_post_connection(self):
+        self.assertGraphQLQueries(1, '''
+            query Posts {
+                postConnection(first: 5) {
+                    edges { node { id user { username } sighting { id location { city } } } }
+                }
+            }
+        ''')
+
+    def test_profile_connection(self):
+        # the default connection counts profiles even when totalCount is not selected
+        data = self.assertGraphQLQueries(3, '''
+            query Profiles {
+                profileConnection(first: 3) {
+                    edges { node { id user { username } favorites { id sighting { location { city } } user { id } } } }
+                }
+            }
+        ''')
+        self.assertEqual(len(data['profileConnection']['edges'][0]['node']['favorites']), 6)
+
+    def test_named_fragment_total_count(self):
+        data = self.assertGraphQLQueries(2, '''
+            query Locations {
+                locationConnection(first: 5) { ...Page edges { node { id } } }
+            }
+            fragment Page on LocationNodeConnection { totalCount }
+        ''')
+        self.assertEqual(data['locationConnection']['totalCount'], 6)
+
+    def test_count_matching_nothing(self):
+        # an empty OR matches nothing, Django raises EmptyResultSet instead of compiling it to SQL
+        for count_mode in ('CACHED', 'ESTIMATED'):
+            with self.subTest(count_mode=count_mode):
+                data = self.assertGraphQLQueries(0, '''
+                    query Locations($countMode: CountMode!) {
+                        locationConnection(first: 5, countMode: $countMode, locationFilterExpression: {or: []}) {
+                            totalCount edges { node { id } }
+                        }
+                    }
+                ''', variables={'countMode': count_mode})
+                self.assertEqual(data['locationConnection'], {'totalCount': 0, 'edges': []})
+
+    @override_settings(RESULT_CACHE_ENABLED=True)
+    def test_cached_connection_page(self):
+        query = '{ sightingConnection(first: 3) { edges { node { id location { city } } } } }'
+        first = self.assertGraphQLQueries(1, query)
+        self.assertEqual(self.assertGraphQLQueries(0, query), first)
+
+    @override_settings(RESULT_CACHE_ENABLED=True)
+    def test_exact_count_is_not_cached(self):
+        query = '{ sightingConnection(first: 3) { totalCount edges { node { id } } } }'
+        self.assertGraphQLQueries(2, query)
+        self.assertGraphQLQueries(2, query)
+
+    def test_nearest_locations(self):
+        query = '{ nearestLocations(latitude: 32.2, longitude: -118.1, k: 3) { distance location { id city } } }'
+        # the spatial index is loaded by the first operation using it, and resident afterwards
+        self.assertGraphQLQueries(2, query)
+        data = self.assertGraphQLQueries(1, query)
+        self.assertEqual([n['location']['city'] for n in data['nearestLocations']], ['City 2', 'City 3', 'City 1'])
+
+    def test_location_suggestions(self):
+        query = '{ locationSuggestions(prefix: "cit", limit: 3) { kind name locationCount sightingCount } }'
+        self.assertGraphQLQueries(1, query)
+        data = self.assertGraphQLQueries(0, query)
+        self.assertEqual(len(data['locationSuggestions']), 3)
+
+    def test_sighting_clusters(self):
+        query = '''
+            query Clusters {
+                sightingClusters(bounds: {west: -130, south: 20, east: -100, north: 40}, zoom: 2) {
+                    latitude longitude count representativeId
+                }
+            }
+        '''
+        data = self.assertGraphQLQueries(1, query)
+        self.assertEqual(sum(cluster['count'] for cluster in data['sightingClusters']), 6)
+        # cached per tile
+        self.assertGraphQLQueries(0, query)
+
+    def test_sighting_density(self):
+        data = self.assertGraphQLQueries(1, '''
+            query Density {
+                sightingDensity(
+                    bounds: {west: -130, south: 20, east: -100, north: 40}, start: "2000-01-01", end: "2005-12-31"
+                ) {
+                    columns rows months indices counts
+                }
+            }
+        ''')
+        self.assertEqual(sum(data['sightingDensity']['counts']), 6)
+
+    def test_create_location(self):
+        query = '''
+            mutation Create($input: CreateNewLocationInput!) {
+                createNewLocation(input: $input) { ... on LocationType { id latitude longitude } }
+            }
+        '''
+        variables = {'input': {'latitude': 10.5, 'longitude': 10.5}}
+        # duplicate lookup, insert
+        self.assertGraphQLQueries(2, query, variables=variables)
+        # duplicate lookup, fetch of the location just created, which is returned as is
+        self.assertGraphQLQueries(2, query, variables=variables)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_query_budget(self):
+        with self.assertRaises(QueryBudgetExceededException):
+            self.execute('{ locationConnection(first: 5) { totalCount edges { node { id } } } }')
+
+
+class KeysetPaginationTests(GraphQLTestCase):
+    """
+    Pages of a connection sorted by a non-unique key, walked in both directions, cover every row exactly once and
+    in order
+    """
+    query = '''
+        query Locations($first: Int, $last: Int, $after: String, $before: String, $sort: SortInput) {
+            locationConnection(first: $first, last: $last, after: $after, before: $before, sort: $sort) {
+                edges { node { id } }
+                pageInfo { hasPreviousPage hasNextPage startCursor endCursor }
+            }
+        }
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        # cities are sorted case-insensitively, so every city is shared by several locations
+        for i, city in enumerate(('Bravo', 'alpha', None, 'Bravo', 'Charlie', 'alpha', None, 'bravo', 'Charlie')):
+            Location.objects.create(city=city, state='CA', country='USA', latitude=30 + i, longitude=-120)
+
+    def expected(self, order: str):
+        # locations without a city sort last ascending, and first descending
+        rows = Location.objects.values_list('city', 'id')
+        pks = [pk for _, pk in sorted(rows, key=lambda row: (row[0] is None, (row[0] or '').lower(), row[1]))]
+        return pks[::-1] if order == 'DES' else pks
+
+    def page(self, order: str, **arguments):
+        variables = {'sort': {'field': 'city', 'order': order}, **arguments}
+        connection = self.execute(self.query, variables=variables)['locationConnection']
+        pks = [int(from_base64(edge['node']['id'])[1]) for edge in connection['edges']]
+        return pks, connection['pageInfo']
+
+    def test_forward_pages(self):
+        for order in ('ASC', 'DES'):
+            with self.subTest(order=order):
+                pks, page_info = self.page(order, first=2)
+                self.assertFalse(page_info['hasPreviousPage'])
+                while page_info['hasNextPage']:
+                    page, page_info = self.page(order, first=2, after=page_info['endCursor'])
+                    pks += page
+                self.assertEqual(pks, self.expected(order))
+
+    def test_backward_pages(self):
+        for order in ('ASC', 'DES'):
+            with self.subTest(order=order):
+                pks, page_info = self.page(order, last=2)
+                self.assertFalse(page_info['hasNextPage'])
+                while page_info['hasPreviousPage']:
+                    page, page_info = self.page(order, last=2, before=page_info['startCursor'])
+                    pks = page + pks
+                self.assertEqual(pks, self.expected(order))
+
+    def test_after_and_before(self):
+        expected = self.expected('ASC')
+        _, first = self.page('ASC', first=2)
+        _, last = self.page('ASC', last=2)
+        pks, _ = self.page('ASC', first=10, after=first['endCursor'], before=last['startCursor'])
+        self.assertEqual(pks, expected[2:-2])
+
+        pks, page_info = self.page('ASC', last=2, after=first['endCursor'], before=last['startCursor'])
+        self.assertEqual(pks, expected[-4:-2])
+        self.assertTrue(page_info['hasPreviousPage'])
+
+
+class QueryShapeTests(TestCase):
+    def test_parameters_do_not_change_shape(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM "t" WHERE "t"."id" IN (%s, %s) LIMIT 21'),
+            query_shape('SELECT *  FROM "t" WHERE "t"."id" IN (%s, %s, %s) LIMIT 3'),
+        )
+
+    def test_columns_change_shape(self):
+        self.assertNotEqual(
+            query_shape('SELECT * FROM "t" WHERE "t"."id" = %s'),
+            query_shape('SELECT * FROM "t" WHERE "t"."location_id" = %s'),
+        )
+
+    def test_repeated_shapes(self):
+        with QueryRecorder() as recorder:
+            for pk in range(5):
+                Location.objects.filter(pk=pk).first()
+            Sighting.objects.count()
+
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual([count for _, count in recorder.repeated_shapes(5)], [5])
+
+
+class DistanceFilterTests(TestCase):
+    arc_length = 1_000_000
+
+    @staticmethod
+    def latitude_at(distance: float) -> float:
+        """
+        Latitude on the prime meridian at the given geodesic distance in meters from (0, 0)
+        """
+        low, high = 0.0, 90.0
+        for _ in range(60):
+            middle = (low + high) / 2
+            if geodesic_distance(middle, 0.0, 0.0, 0.0) < distance:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    @classmethod
+    def setUpTestData(cls):
+        # along the meridian near the equator the sphere overestimates the geodesic distance by ~0.5%, so both
+        # locations lie beyond arc_length on the sphere
+        cls.inside = Location.objects.create(latitude=cls.latitude_at(cls.arc_length - 10), longitude=0)
+        cls.outside = Location.objects.create(latitude=cls.latitude_at(cls.arc_length + 10), longitude=0)
+        cls.near = Location.objects.create(latitude=1, longitude=1)
+        cls.far = Location.objects.create(latitude=20, longitude=0)
+
+    def test_boundary_uses_geodesic_distance(self):
+        self.assertGreater(math.radians(self.inside.latitude) * EARTH_MEAN_RADIUS, self.arc_length)
+
+        within = find_locations_by_distance_within(Location.objects.all(), 0, 0, self.arc_length)
+        self.assertCountEqual(within.values_list('id', flat=True), [self.inside.id, self.near.id])
+
+        outside = find_locations_by_distance_outside(Location.objects.all(), 0, 0, self.arc_length)
+        self.assertCountEqual(outside.values_list('id', flat=True), [self.outside.id, self.far.id])
+
+
+class SpatialTests(GraphQLTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        coordinates = [(0, 179.5), (0, -179.5), (5, 175), (-5, -175), (0, 0), (89.5, 0), (89.5, 180), (42.6, -5.6)]
+        cls.locations = [Location.objects.create(latitude=lat, longitude=lon) for lat, lon in coordinates]
+
+    def ids(self, query) -> set:
+        return set(Location.objects.filter(query).values_list('id', flat=True))
+
+    def test_bounding_box_across_antimeridian(self):
+        boxes = bounding_boxes(0, 179, 500_000)
+        self.assertEqual(len(boxes), 2)
+        self.assertEqual([box[3] for box in boxes if box[1] > 0], [180.0])
+        self.assertEqual([box[1] for box in boxes if box[1] < 0], [-180.0])
+
+        matched = self.ids(generate_lat_lon_bounding_box_query(0, 179, 500_000))
+        self.assertEqual(matched, {location.id for location in self.locations[:2]})
+
+    def test_bounding_box_across_pole(self):
+        [(south, west, north, east)] = bounding_boxes(89, 0, 500_000)
+        self.assertLess(south, 85)
+        self.assertEqual((west, north, east), (-180.0, 90.0, 180.0))
+
+        matched = self.ids(generate_lat_lon_bounding_box_query(89, 0, 500_000))
+        self.assertEqual(matched, {location.id for location in self.locations[5:7]})
+
+    def test_geohash_cells(self):
+        self.assertEqual(geohash.encode(42.6, -5.6, 5), 'ezs42')
+        self.assertEqual(Location.objects.get(latitude=42.6).geohash[:5], 'ezs42')
+
+        cells = geohash.covering_cells(10, 20, 12.5, 23)
+        self.assertLessEqual(len(cells), geohash.MAX_COVERING_CELLS)
+        for step in range(11):
+            latitude, longitude = 10 + step * 0.25, 20 + step * 0.3
+            self.assertTrue(any(geohash.encode(latitude, longitude).startswith(cell) for cell in cells))
+
+    def test_nearest_locations(self):
+        for latitude, longitude in ((0, 178), (60, -30), (-45, 100)):
+            expected = sorted(
+                (geodesic_distance(float(location.latitude), float(location.longitude), latitude, longitude),
+                 location.id)
+                for location in self.locations
+            )[:3]
+            nearest = get_location_index().nearest(latitude, longitude, 3)
+            self.assertEqual([pk for _, pk in nearest], [pk for _, pk in expected])
+            for (distance, _), (expected_distance, _) in zip(nearest, expected):
+                self.assertAlmostEqual(distance, expected_distance, places=3)
+
+    def test_within_bounds_across_antimeridian(self):
+        bounds = WithinBoundsFilter(west=170, south=-10, east=-170, north=10)
+        self.assertTrue(bounds.validate())
+        matched = set(bounds.filter_qs(Location.objects.all()).values_list('id', flat=True))
+        self.assertEqual(matched, {location.id for location in self.locations[:4]})
+
+    def test_clusters(self):
+        # zoom 3 cells are 2.8125 degrees wide: the first three sightings share a cell
+        sightings = [
+            Sighting.objects.create(
+                location=Location.objects.create(latitude=latitude, longitude=longitude),
+                sighting_datetime=datetime(2000, 1, 1, tzinfo=timezone.utc),
+            )
+            for latitude, longitude in ((10.1, 10.1), (10.2, 10.3), (10.3, 10.5), (20, 20))
+        ]
+
+        clusters = sorted(cluster_sightings(3, 0, 0, 22, 22), key=lambda cluster: cluster['count'])
+        self.assertEqual([cluster['count'] for cluster in clusters], [1, 3])
+        self.assertEqual([cluster['representative'] for cluster in clusters], [sightings[3].id, sightings[0].id])
+        self.assertAlmostEqual(clusters[1]['latitude'], 10.2)
+        self.assertAlmostEqual(clusters[1]['longitude'], 10.3)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(cluster_sightings(3, 0, 0, 22, 22)), 2)
+
+
+class DensityCubeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(latitude=10.5, longitude=20.5)
+        cls.other = Location.objects.create(latitude=-30.5, longitude=-60.5)
+        for month in (1, 1, 2):
+            Sighting.objects.create(
+                location=cls.location, sighting_datetime=datetime(2001, month, 1, 12, tzinfo=timezone.utc)
+            )
+        for month in (1, 2):
+            Sighting.objects.create(
+                location=cls.other, sighting_datetime=datetime(2001, month, 1, 12, tzinfo=timezone.utc)
+            )
+
+    def cube(self) -> dict:
+        return {
+            (month, cell_x, cell_y): count
+            for month, cell_x, cell_y, count
+            in SightingDensity.objects.filter(count__gt=0).values_list('month', 'cell_x', 'cell_y', 'count')
+        }
+
+    def assertCubeRebuilt(self):
+        """
+        The incrementally maintained cube matches one recomputed from scratch
+        """
+        cube = self.cube()
+        rebuild_density_cube()
+        self.assertEqual(cube, self.cube())
+
+    def test_counts(self):
+        cell = density_cell(10.5, 20.5)
+        self.assertEqual(cell, (200, 100))
+        self.assertEqual(self.cube(), {
+            (date(2001, 1, 1), *cell): 2,
+            (date(2001, 2, 1), *cell): 1,
+            (date(2001, 1, 1), *density_cell(-30.5, -60.5)): 1,
+            (date(2001, 2, 1), *density_cell(-30.5, -60.5)): 1,
+        })
+        self.assertCubeRebuilt()
+
+    def test_move_sighting_and_location(self):
+        sighting = Sighting.objects.filter(location=self.location).first()
+        sighting.location = self.other
+        sighting.save()
+        self.assertCubeRebuilt()
+
+        self.location.latitude = 45.5
+        self.location.save()
+        self.assertEqual(self.cube()[(date(2001, 2, 1), *density_cell(45.5, 20.5))], 1)
+        self.assertCubeRebuilt()
+
+    def test_delete_location(self):
+        def delete_queries(location: Location) -> int:
+            with CaptureQueriesContext(connection) as context:
+                location.delete()
+            return len(context.captured_queries)
+
+        # both locations have sightings in two months; deleting them does not run queries per sighting
+        self.assertEqual(delete_queries(self.location), delete_queries(self.other))
+        self.assertEqual(self.cube(), {})
+
+    def test_counts_stay_positive(self):
+        adjust_density(-30.5, -60.5, datetime(2001, 1, 1, tzinfo=timezone.utc), delta=-5)
+        self.assertEqual(SightingDensity.objects.get(cell_x=119, cell_y=59, month=date(2001, 1, 1)).count, 0)
+
+    def test_slice(self):
+        cube = density_slice(20, 10, 21, 11, date(2000, 12, 1), date(2001, 2, 28))
+        self.assertEqual((cube['columns'], cube['rows']), (2, 2))
+        self.assertEqual(cube['months'], [date(2000, 12, 1), date(2001, 1, 1), date(2001, 2, 1)])
+        # [month][row][column] of the cell containing the location
+        self.assertEqual(cube['indices'], [4, 8])
+        self.assertEqual(cube['counts'], [2, 1])
+
+
+class PointTileTests(GraphQLTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.sightings = [
+            Sighting.objects.create(
+                location=Location.objects.create(latitude=latitude, longitude=longitude),
+                sighting_datetime=datetime(2000, 1, 1, 0, 0, second, tzinfo=timezone.utc),
+            )
+            for second, (latitude, longitude) in enumerate(((10.5, 20.25), (-45.0, 100.75), (10.0, -20.0)))
+        ]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        tile_cache = override_settings(TILE_CACHE_DIR=directory.name)
+        tile_cache.enable()
+        self.addCleanup(tile_cache.disable)
+
+    def tile(self, z: int, x: int, y: int):
+        """
+        Fetch a tile and decode it into its (sighting id, longitude, latitude, timestamp) points
+        """
+        response = self.client.get(f'/tiles/{z}/{x}/{y}')
+        self.assertEqual(response.status_code, 200)
+        payload = response.content
+
+        magic, version, n, _ = struct.unpack_from('<4sIII', payload)
+        self.assertEqual((magic, version), (b'UFOT', 1))
+        self.assertEqual(len(payload), 16 + n * (8 + 8 + 8 + 4))
+        longitudes = struct.unpack_from(f'<{n}d', payload, 16)
+        latitudes = struct.unpack_from(f'<{n}d', payload, 16 + 8 * n)
+        ids = struct.unpack_from(f'<{n}q', payload, 16 + 16 * n)
+        timestamps = struct.unpack_from(f'<{n}i', payload, 16 + 24 * n)
+        return list(zip(ids, longitudes, latitudes, timestamps)), response['ETag']
+
+    def test_tile_contents(self):
+        start = int(datetime(2000, 1, 1, tzinfo=timezone.utc).timestamp())
+        # zoom 0 is two tiles, the eastern hemisphere is x = 1
+        points, _ = self.tile(0, 1, 0)
+        self.assertEqual(points, [
+            (self.sightings[0].id, 20.25, 10.5, start),
+            (self.sightings[1].id, 100.75, -45.0, start + 1),
+        ])
+
+        points, _ = self.tile(0, 0, 0)
+        self.assertEqual(points, [(self.sightings[2].id, -20.0, 10.0, start + 2)])
+
+    def test_tile_invalidated_by_save(self):
+        points, etag = self.tile(0, 0, 0)
+        self.assertEqual(len(points), 1)
+        self.assertEqual(self.client.get('/tiles/0/0/0', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sighting = self.sightings[0]
+            sighting.location = Location.objects.create(latitude=50.0, longitude=-70.5)
+            sighting.save()
+
+        points, _ = self.tile(0, 0, 0)
+        self.assertEqual([(pk, longitude, latitude) for pk, longitude, latitude, _ in points], [
+            (sighting.id, -70.5, 50.0),
+            (self.sightings[2].id, -20.0, 10.0),
+        ])
+        self.assertEqual([pk for pk, *_ in self.tile(0, 1, 0)[0]], [self.sightings[1].id])
+
+        # the file of the stale version of the tile is removed once the current one is written
+        self.assertEqual(len(os.listdir(os.path.join(settings.TILE_CACHE_DIR, '0', '0'))), 1)
+
+
+class LocationFilterExpressionTests(GraphQLTestCase):
+    query = '''
+        query Locations($expression: LocationFilterExpressionInput) {
+            locationConnection(first: 50, locationFilterExpression: $expression) { edges { node { city } } }
+        }
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, (city, state) in enumerate((('Austin', 'TX'), ('Dallas', 'TX'), ('Fresno', 'CA'), ('Albany', 'NY'))):
+            Location.objects.create(city=city, state=state, country='USA', latitude=30 + i, longitude=-100)
+
+    def cities(self, expression: dict) -> set:
+        data = self.execute(self.query, variables={'expression': expression})
+        return {edge['node']['city'] for edge in data['locationConnection']['edges']}
+
+    @staticmethod
+    def state(state: str) -> dict:
+        return {'filter': {'stateExact': state}}
+
+    def test_or(self):
+        self.assertEqual(self.cities({'or': [self.state('CA'), self.state('NY')]}), {'Fresno', 'Albany'})
+        self.assertEqual(self.cities({'or': []}), set())
+
+    def test_not(self):
+        self.assertEqual(self.cities({'not': self.state('TX')}), {'Fresno', 'Albany'})
+        self.assertEqual(self.cities({'not': {'not': self.state('TX')}}), {'Austin', 'Dallas'})
+        # an empty filter matches every location
+        self.assertEqual(self.cities({'not': {'filter': {}}}), set())
+        self.assertEqual(self.cities({'not': {'or': []}}), {'Austin', 'Dallas', 'Fresno', 'Albany'})
+
+    def test_composition(self):
+        expression = {'and': [
+            {'or': [self.state('TX'), self.state('NY')]},
+            {'not': {'filter': {'cityExact': 'dallas'}}},
+        ]}
+        self.assertEqual(self.cities(expression), {'Austin', 'Albany'})
+
+        # the whole tree is compiled into the query of the page
+        self.assertGraphQLQueries(1, self.query, variables={'expression': expression})
+
+
+class LocationSearchTests(GraphQLTestCase):
+    query = '''
+        query Locations($q: String) {
+            locationConnection(first: 50, locationFilter: {q: $q}) { edges { node { city } } }
+        }
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, (city, state, country) in enumerate((
+            ('Portland', 'OR', 'USA'),
+            ('Portland', 'ME', 'USA'),
+            ('Port Orford', 'OR', 'USA'),
+            ('Newport', 'OR', 'USA'),
+            ('Oregon City', 'OR', 'USA'),
+            ('Porto', None, 'Portugal'),
+        )):
+            Location.objects.create(city=city, state=state, country=country, latitude=30 + i, longitude=-100)
+
+    def cities(self, q: str) -> list:
+        data = self.execute(self.query, variables={'q': q})
+        return [edge['node']['city'] for edge in data['locationConnection']['edges']]
+
+    def test_terms_match_any_field(self):
+        self.assertCountEqual(self.cities('port'), ['Portland', 'Portland', 'Port Orford', 'Newport', 'Porto'])
+        self.assertCountEqual(self.cities('PORT me'), ['Portland'])
+        self.assertCountEqual(self.cities('or city'), ['Oregon City'])
+        self.assertCountEqual(self.cities('portugal'), ['Porto'])
+        # terms shorter than the n-grams of the index
+        self.assertCountEqual(self.cities('me'), ['Portland'])
+        self.assertEqual(self.cities('nowhere'), [])
+
+    def test_relevance(self):
+        self.assertEqual(self.cities('portland'), ['Portland', 'Portland'])
+        if not uses_database_search():
+            # whole-field and prefix matches rank above matches inside a word
+            self.assertEqual(self.cities('port')[-1], 'Newport')
+
+    @skipIf(uses_database_search(), 'served by trigram indexes')
+    def test_index_fallback(self):
+        self.assertEqual(search_term_q('portland'), Q(id__in=sorted(
+            Location.objects.filter(city='Portland').values_list('id', flat=True)
+        )))
+        self.assertEqual(search_term_q('or'), Q(search_document__contains='or'))
+
+        # a term matching too many locations is handed back to the database
+        with patch('sightings.helpers.search.MAX_INDEXED_MATCHES', 2):
+            self.assertEqual(search_term_q('port'), Q(search_document__contains='port'))
+            self.assertCountEqual(self.cities('port'), ['Portland', 'Portland', 'Port Orford', 'Newport', 'Porto'])
+
+    @skipIf(uses_database_search(), 'served by trigram indexes')
+    def test_index_follows_writes(self):
+        self.assertEqual(self.cities('salem'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            location = Location.objects.create(city='Salem', state='OR', country='USA', latitude=45, longitude=-123)
+        self.assertEqual(self.cities('salem'), ['Salem'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            location.city = 'Eugene'
+            location.save()
+        self.assertEqual(self.cities('salem'), [])
+        self.assertEqual(self.cities('eugene'), ['Eugene'])
+
+
+class TimeOfDayFilterTests(GraphQLTestCase):
+    query = '''
+        query Sightings($filter: DateTimeFilterInput) {
+            sightingConnection(first: 50, sightingFilter: {datetimeFilter: $filter}) {
+                edges { node { sightingDatetime } }
+            }
+        }
+    '''
+    times = ('21:59:59', '22:00:00', '23:30:00', '01:00:00', '02:00:00', '02:00:01', '12:00:00')
+
+    @classmethod
+    def setUpTestData(cls):
+        location = Location.objects.create(latitude=30, longitude=-100)
+        for value in cls.times:
+            hour, minute, second = map(int, value.split(':'))
+            Sighting.objects.create(
+                location=location, sighting_datetime=datetime(2000, 1, 1, hour, minute, second, tzinfo=timezone.utc)
+            )
+
+    def times_matching(self, datetime_filter: dict) -> list:
+        data = self.execute(self.query, variables={'filter': datetime_filter})
+        return sorted(
+            datetime.fromisoformat(edge['node']['sightingDatetime']).astimezone(dj_timezone.get_current_timezone())
+            .strftime('%H:%M:%S')
+            for edge in data['sightingConnection']['edges']
+        )
+
+    def test_time_column(self):
+        self.assertEqual(
+            sorted(Sighting.objects.values_list('sighting_time', flat=True)),
+            [3600, 7200, 7201, 43200, 79199, 79200, 84600],
+        )
+
+    def test_range(self):
+        self.assertEqual(
+            self.times_matching({'timeInRange': {'timeStart': '01:00:00', 'timeEnd': '02:00:00'}}),
+            ['01:00:00', '02:00:00'],
+        )
+
+    def test_range_wrapping_midnight(self):
+        # both endpoints are included
+        self.assertEqual(
+            self.times_matching({'timeInRange': {'timeStart': '22:00:00', 'timeEnd': '02:00:00'}}),
+            ['01:00:00', '02:00:00', '22:00:00', '23:30:00'],
+        )
+        # timeAfter and timeBefore exclude them
+        self.assertEqual(
+            self.times_matching({'timeAfter': '22:00:00', 'timeBefore': '02:00:00'}),
+            ['01:00:00', '23:30:00'],
+        )
+
+    def test_seconds(self):
+        self.assertEqual(self.times_matching({'timeExact': '02:00:01'}), ['02:00:01'])
+        self.assertEqual(self.times_matching({'timeAfter': '21:59:59', 'timeBefore': '23:00:00'}), ['22:00:00'])
+
+    @override_settings(TIME_ZONE='America/Los_Angeles')
+    def test_server_time_zone(self):
+        # times of day are those of the server time zone, 8 hours behind UTC in January
+        with self.captureOnCommitCallbacks(execute=True):
+            for sighting in Sighting.objects.all():
+                sighting.save()
+
+        self.assertEqual(
+            self.times_matching({'timeInRange': {'timeStart': '18:00:00', 'timeEnd': '04:00:00'}}),
+            ['04:00:00', '18:00:00', '18:00:01'],
+        )
+        self.assertEqual(self.times_matching({'timeExact': '14:00:00'}), ['14:00:00'])
+
+
+class PersistedQueryTests(GraphQLTestCase):
+    query = '{ locationConnection(first: 5) { edges { node { city } } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        Location.objects.create(city='Roswell', state='NM', country='USA', latitude=33.4, longitude=-104.5)
+
+    def post(self, body: dict) -> Tuple[int, dict]:
+        response = self.client.post(self.endpoint, json.dumps(body), content_type='application/json')
+        return response.status_code, response.json()
+
+    def extensions(self, query: str = None, version: int = 1) -> dict:
+        sha256_hash = hashlib.sha256((query or self.query).encode()).hexdigest()
+        return {'persistedQuery': {'version': version, 'sha256Hash': sha256_hash}}
+
+    def test_register_and_hit(self):
+        status, result = self.post({'extensions': self.extensions()})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+        for body in ({'query': self.query, 'extensions': self.extensions()}, {'extensions': self.extensions()}):
+            status, result = self.post(body)
+            self.assertEqual(status, 200)
+            self.assertEqual(result['data']['locationConnection']['edges'], [{'node': {'city': 'Roswell'}}])
+
+    def test_hash_mismatch(self):
+        status, result = self.post({'query': self.query, 'extensions': self.extensions('{ __typename }')})
+        self.assertEqual(status, 400)
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'BAD_REQUEST')
+
+        # the mismatched query was not registered under either hash
+        for query in (self.query, '{ __typename }'):
+            status, result = self.post({'extensions': self.extensions(query)})
+            self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_FOUND')
+
+    def test_unsupported_version(self):
+        status, result = self.post({'extensions': self.extensions(version=2)})
+        self.assertEqual(status, 400)
+        self.assertEqual(result['errors'][0]['extensions']['code'], 'PERSISTED_QUERY_NOT_SUPPORTED')
+
+    def test_get(self):
+        register_persisted_query(self.query)
+        response = self.client.get(self.endpoint, {'extensions': json.dumps(self.extensions())})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['locationConnection']['edges'], [{'node': {'city': 'Roswell'}}])
+
+        response = self.client.get(self.endpoint, {'extensions': '{'})
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryCostTests(GraphQLTestCase):
+    query = '{ locationConnection(first: 10) { edges { node { id } } } }'
+
+    def post(self, query: str) -> dict:
+        response = self.client.post(self.endpoint, json.dumps({'query': query}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_within_budget(self):
+        result = self.post(self.query)
+        self.assertNotIn('errors', result)
+        self.assertEqual(result['extensions']['cost']['requested'], 21)
+
+    @override_settings(QUERY_COST_BUDGET=20)
+    def test_over_budget(self):
+        with self.assertNumQueries(0), patch('strawberry.utils.logging.StrawberryLogger.error') as log_error:
+            result = self.post(self.query)
+
+        self.assertIsNone(result['data'])
+        self.assertEqual([error['extensions']['code'] for error in result['errors']], ['QUERY_TOO_COMPLEX'])
+        self.assertEqual(result['extensions']['cost']['requested'], 21)
+        # refusals are not logged as server errors
+        log_error.assert_not_called()
+
+    @override_settings(QUERY_MAX_DEPTH=3)
+    def test_too_deep(self):
+        result = self.post(self.query)
+        self.assertEqual([error['extensions']['code'] for error in result['errors']], ['QUERY_TOO_COMPLEX'])
+        self.assertEqual(result['extensions']['cost']['depth'], 4)
+
+        self.assertNotIn('errors', self.post('{ locationConnection(first: 10) { totalCount } }'))
+
+
+class TracingTests(GraphQLTestCase):
+    query = '{ locationConnection(first: 5) { edges { node { city } } } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        Location.objects.create(city='Roswell', state='NM', country='USA', latitude=33.4, longitude=-104.5)
+        cls.staff = User.objects.create(username='staff', is_staff=True)
+        cls.user = User.objects.create(username='user')
+
+    def extensions(self, traced: bool = True) -> dict:
+        headers = {'HTTP_X_GRAPHQL_TRACING': '1'} if traced else {}
+        body = json.dumps({'query': self.query})
+        response = self.client.post(self.endpoint, body, content_type='application/json', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json().get('extensions', {})
+
+    @override_settings(DEBUG=True)
+    def test_header_under_debug(self):
+        tracing = self.extensions()['tracing']
+        resolvers = {'.'.join(map(str, resolver['path'])): resolver for resolver in tracing['execution']['resolvers']}
+        self.assertEqual(len(resolvers['locationConnection']['queries']), 1)
+        self.assertIn('sightings_location', resolvers['locationConnection']['queries'][0]['sql'])
+
+        self.assertNotIn('tracing', self.extensions(traced=False))
+
+    def test_header_from_staff(self):
+        self.client.force_login(self.staff)
+        self.assertIn('tracing', self.extensions())
+
+    def test_header_ignored(self):
+        self.assertNotIn('tracing', self.extensions())
+        self.client.force_login(self.user)
+        self.assertNotIn('tracing', self.extensions())
+
+    @override_settings(GRAPHQL_TRACING=True)
+    def test_summary_log(self):
+        with self.assertLogs('sightings.gql.extensions.tracing', 'INFO') as logs:
+            self.assertNotIn('tracing', self.extensions(traced=False))
+
+        summary = json.loads(logs.records[0].getMessage())
+        self.assertEqual(summary['queries'], 1)
+        self.assertEqual(summary['resolvers'][0]['path'], 'locationConnection')
+
+
+class MetricsTests(TestCase):
+    sample = 'ufo_cache_requests_total{cache="metrics-test",result="hit"}'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        metrics_dir = override_settings(METRICS_DIR=self.directory)
+        metrics_dir.enable()
+        self.addCleanup(metrics_dir.disable)
+
+        # archive the files of exited processes again, as on the first flush of a worker
+        archived = patch.object(get_registry(), '_archived_pid', os.getpid() + 1)
+        archived.start()
+        self.addCleanup(archived.stop)
+
+    def write_samples(self, pid: int, value: float):
+        path = os.path.join(self.directory, f'{pid}.json')
+        with open(path, 'w') as f:
+            json.dump([['ufo_cache_requests_total', '', [['cache', 'metrics-test'], ['result', 'hit']], value]], f)
+
+    def scrape(self) -> float:
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        values = [line.split()[-1] for line in response.content.decode().splitlines() if line.startswith(self.sample)]
+        return float(values[0])
+
+    def test_aggregates_processes(self):
+        count_cache_lookup('metrics-test', True)
+        # a live worker process, and one that has exited
+        self.write_samples(os.getppid(), 2)
+        self.write_samples(2 ** 31 - 1, 4)
+
+        self.assertEqual(self.scrape(), 7)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted(['archive.json', 'metrics.lock', f'{os.getpid()}.json', f'{os.getppid()}.json']),
+        )
+
+        # the samples of the exited process are kept in the archive
+        count_cache_lookup('metrics-test', True)
+        self.assertEqual(self.scrape(), 8)
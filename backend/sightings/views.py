@@ -1,5 +1,73 @@
-from django.http import HttpResponse
+import json
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+from strawberry.django.views import GraphQLView
+from strawberry.exceptions import MissingQueryError
+from strawberry.http import GraphQLRequestData, parse_request_data
+from sightings.gql.persisted_queries import PersistedQueryError, resolve_persisted_query
+from sightings.helpers.metrics import CONTENT_TYPE, get_registry
+from sightings.helpers.point_tiles import get_tile
+from sightings.helpers.tiles import MAX_TILE_ZOOM, tile_count
 
 
 def index(request):
     return HttpResponse("Hello, world. You're at the ufo sightings index.")
+
+
+@require_GET
+def sighting_tile(request, z: int, x: int, y: int):
+    """
+    Serve the sightings of a z/x/y tile as a packed binary point buffer, see sightings.helpers.point_tiles
+    """
+    columns, rows = tile_count(z) if z <= MAX_TILE_ZOOM else (0, 0)
+    if not (x < columns and y < rows):
+        raise Http404(f'No tile {z}/{x}/{y}')
+
+    payload, mtime = get_tile(z, x, y)
+    etag = f'"{mtime:x}-{len(payload):x}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(payload, content_type='application/octet-stream')
+        response['ETag'] = etag
+
+    patch_cache_control(response, public=True, max_age=settings.TILE_MAX_AGE)
+    return response
+
+
+@require_GET
+def metrics(request):
+    """
+    Serve the metrics of every worker process in the Prometheus text format, see sightings.helpers.metrics
+    """
+    return HttpResponse(get_registry().render(), content_type=CONTENT_TYPE)
+
+
+class PersistedQueryGraphQLView(GraphQLView):
+    """
+    GraphQL view accepting automatic persisted queries, where clients send the sha256 hash of a query in place of
+    its text once it has been registered, see sightings.gql.persisted_queries
+    """
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except PersistedQueryError as e:
+            return JsonResponse(e.as_response_data(), status=e.status)
+
+    def get_request_data(self, request) -> GraphQLRequestData:
+        try:
+            data = self.parse_body(request)
+        except json.decoder.JSONDecodeError:
+            raise SuspiciousOperation("Unable to parse request body as JSON")
+
+        try:
+            request_data = parse_request_data(resolve_persisted_query(data))
+        except MissingQueryError:
+            raise SuspiciousOperation("No GraphQL query found in the request")
+
+        # read by sightings.middleware.QueryBudgetMiddleware to pick the operation's query budget
+        request.graphql_operation_name = request_data.operation_name
+        return request_data
@@ -1,5 +1,9 @@
 import strawberry
+from django.conf import settings
+from strawberry.extensions import ParserCache, ValidationCache
 from strawberry_django_plus.optimizer import DjangoOptimizerExtension
+from sightings.gql.extensions import QueryCostExtension, TracingExtension
+from sightings.helpers.metrics import collect_lru_cache
 from sightings.gql.query import (
     LocationQuery,
     SightingQuery,
@@ -35,10 +39,27 @@ class RootMutation(
     pass
 
 
-schema = strawberry.Schema(
+class Schema(strawberry.Schema):
+    def process_errors(self, errors, execution_context=None):
+        # strawberry logs every error with a stack trace
+        super().process_errors(QueryCostExtension.unexpected_errors(errors), execution_context)
+
+
+# bounded LRU caches of parsed and validated documents, keyed by query text
+parser_cache = ParserCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+validation_cache = ValidationCache(maxsize=settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+collect_lru_cache('graphql_documents', parser_cache.cached_parse_document)
+collect_lru_cache('graphql_validation', validation_cache.cached_validate_document)
+
+
+schema = Schema(
     query=RootQuery,
     mutation=RootMutation,
     extensions=[
-        DjangoOptimizerExtension
+        DjangoOptimizerExtension,
+        QueryCostExtension,
+        TracingExtension,
+        parser_cache,
+        validation_cache,
     ]
 )
@@ -55,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sightings.middleware.MetricsMiddleware',
+    'sightings.middleware.QueryBudgetMiddleware',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -97,6 +99,29 @@ DATABASES = {
     }
 }
 
+# Both caches default to process local memory. Point CACHE_URL and RESULT_CACHE_URL at a shared backend, e.g.
+# rediscache://127.0.0.1:6379/1 (requires django-redis), so that model version counters and cached results are
+# shared by every worker process. "default" holds the version counters and counts, "results" holds connection pages.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+    'results': env.cache('RESULT_CACHE_URL', default='locmemcache://results'),
+}
+
+# local memory caches evict least recently used entries once MAX_ENTRIES is reached; configure Redis with
+# maxmemory and maxmemory-policy allkeys-lru for the same behaviour
+RESULT_CACHE_MAX_ENTRIES = 2000
+RESULT_CACHE_TIMEOUT = 60 * 10  # seconds
+CACHES['results'].setdefault('OPTIONS', {}).setdefault('MAX_ENTRIES', RESULT_CACHE_MAX_ENTRIES)
+
+# connection pages are only cached when the version counters are shared: with a process local default cache, a
+# write served by one worker process would not invalidate the pages cached by the others
+RESULT_CACHE_ENABLED = env.bool(
+    'RESULT_CACHE_ENABLED', default=CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+)
+
+# parsed and validated GraphQL documents kept by each worker process
+GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -139,3 +164,65 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOCATION_DISTANCE_THRESHOLD = 50  # meters
+
+LOCATION_INDEX_TTL = 300  # seconds before the in-process spatial index is rebuilt from the database
+
+MAX_NEAREST_LOCATIONS = 100
+
+MAX_LOCATION_SUGGESTIONS = 25
+
+# distance sorts scan every row of the region their connection is filtered to, which may not be larger than this
+DISTANCE_SORT_MAX_AREA = 2.5e12  # square meters, about a circle of 900 km radius
+
+# binary point tiles served from tiles/<z>/<x>/<y>
+TILE_CACHE_DIR = env.str('TILE_CACHE_DIR', default=os.path.join(BASE_DIR, 'tile_cache'))
+TILE_MAX_AGE = 60  # seconds
+
+# static cost analysis of GraphQL operations, see sightings.gql.extensions.cost
+QUERY_COST_BUDGET = 5000
+QUERY_MAX_DEPTH = 12
+QUERY_COST_LIST_SIZE = 20  # assumed length of lists without a first, last, k or limit argument
+
+# resolver and SQL tracing, see sightings.gql.extensions.tracing. Timing every resolver has a cost, so operations
+# are only traced and logged when GRAPHQL_TRACING is set, or on request through the header.
+GRAPHQL_TRACING = env.bool('GRAPHQL_TRACING', default=False)
+# the header is honoured only when DEBUG is on or the request is made by a staff user; it is ignored otherwise, so
+# clients cannot have the SQL of their operations sent back to them
+GRAPHQL_TRACING_HEADER = 'X-GraphQL-Tracing'
+GRAPHQL_TRACING_LOG_RESOLVERS = 10  # slowest resolver paths logged per operation
+
+# database queries allowed per request, by GraphQL operation name, see sightings.middleware.QueryBudgetMiddleware
+QUERY_BUDGET = 25
+QUERY_BUDGETS = {}
+N_PLUS_ONE_THRESHOLD = 5  # repetitions of a query shape flagged as N+1
+QUERY_BUDGET_RAISE = env.bool('QUERY_BUDGET_RAISE', default=False)
+
+# Prometheus metrics served at /metrics, see sightings.helpers.metrics. When METRICS_DIR is set, every worker
+# process that serves requests writes its samples there at most every METRICS_FLUSH_INTERVAL seconds, and /metrics
+# adds up the samples of every worker; set it when running several worker processes, and clear the directory when
+# the server starts to reset the counters. When unset, /metrics serves the samples of the process answering it.
+METRICS_DIR = env.str('METRICS_DIR', default=None)
+METRICS_FLUSH_INTERVAL = 5  # seconds
+# GraphQL operation names given their own metric label, others are counted as "other" so that clients cannot
+# create unbounded label values
+METRICS_OPERATIONS = env.list('METRICS_OPERATIONS', default=[])
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'sightings.middleware': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'sightings.gql.extensions.tracing': {
+            'handlers': ['console'],
+            'level': env.str('GRAPHQL_TRACING_LOG_LEVEL', default='INFO' if GRAPHQL_TRACING else 'WARNING'),
+        },
+    },
+}
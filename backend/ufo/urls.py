@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.urls import path
-from strawberry.django.views import GraphQLView
+from sightings.views import PersistedQueryGraphQLView, metrics, sighting_tile
 from .schema import schema
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', GraphQLView.as_view(schema=schema))
+    path('api/', PersistedQueryGraphQLView.as_view(schema=schema)),
+    path('tiles/<int:z>/<int:x>/<int:y>', sighting_tile),
+    path('metrics', metrics),
 ]